@@ -0,0 +1,157 @@
+"""
+This script benchmarks the catalog export pipeline on synthetic inputs.
+
+It generates V_CATALOG, scripts and tableau.csv exports plus Tableau workbooks
+at the requested scale, then times each stage: the readers, every sheet
+builder of export_to_excel, the workbook save and the Tableau extractor, with
+the same instrumentation as the --profile flag. Each stage records its wall
+time, number of calls, rows written and peak traced memory; the output file
+size and the process's peak resident memory are recorded too.
+Results are written as JSON, and --compare prints the change against an
+earlier results file so regressions show up before a full warehouse refresh.
+
+To run the benchmark from the repository root:
+    python -m benchmarks.run_benchmark
+    python -m benchmarks.run_benchmark --tables 5000 --project-tables 1000 --engine stream
+    python -m benchmarks.run_benchmark --compare output/benchmark_before.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from openpyxl.styles import NamedStyle, Font
+from benchmarks.synthetic import DEFAULT_SCALE, generate_inputs
+from modules import profiling
+from modules.excel_helpers import SQL_LAYOUTS, export_to_excel
+from modules.profiling import BYTES_PER_MB
+from modules.readers import read_csv_schema, read_csv_scripts, read_csv_tableau, read_additional_v_catalog, read_all_scripts, in_scope_names
+from modules.tableau import extract_folder, write_tableau_csv
+from modules.writers import WRITER_ENGINES
+
+OUTPUT_FILE = 'output/benchmark.json'
+TABLE_STYLE = 'TableStyleLight8'
+
+def _max_rss_mb():
+    try:
+        import resource
+    except ImportError:
+        return None
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return max_rss / BYTES_PER_MB if sys.platform == 'darwin' else max_rss / 1024
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run_benchmark(work_dir, scale, engine='openpyxl', sql_layout='lines', workers=1, used_by=False):
+    paths = generate_inputs(work_dir, scale)
+    output_path = os.path.join(work_dir, 'output', 'benchmark.xlsx')
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    profiler = profiling.enable()
+    try:
+        # Parse every input from scratch: the pickle cache would otherwise hide the readers
+        tables = read_csv_schema(paths['tables'], use_cache=False)
+        scripts = read_csv_scripts(paths['scripts'], use_cache=False)
+        tableau_fields = read_csv_tableau(paths['tableau'], paths['tableau_workbook'], use_cache=False)
+        in_scope = in_scope_names(tables, scripts)
+        additional_v_catalog = read_additional_v_catalog(paths['v_catalog'], in_scope, use_cache=False)
+        all_scripts = read_all_scripts(paths['all_scripts'], in_scope, use_cache=False)
+
+        header_style = NamedStyle(name="header_style")
+        header_style.font = Font(name='Aptos', size=14, bold=True)
+        export_to_excel(tables, scripts, tableau_fields, additional_v_catalog, all_scripts, output_path, header_style, TABLE_STYLE, TABLE_STYLE,
+                        "Instructions", "Navigation", "Datasets", "Scripts", "Tableau Calculated Fields", sql_layout=sql_layout, engine=engine, used_by=used_by)
+
+        calculated_fields, dependencies = extract_folder(paths['tableau_folder'], workers)
+        write_tableau_csv(calculated_fields, os.path.join(work_dir, 'output', 'tableau.csv'))
+    finally:
+        profiling.disable()
+
+    return {
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'commit': _git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'scale': scale,
+        'engine': engine,
+        'sql_layout': sql_layout,
+        'used_by': used_by,
+        'workers': workers,
+        'stages': profiler.stages,
+        'total_seconds': profiler.total_seconds,
+        'output_bytes': os.path.getsize(output_path),
+        'tableau_fields_extracted': len(calculated_fields),
+        'max_rss_mb': _max_rss_mb(),
+    }
+
+def print_results(results, baseline=None):
+    baseline_stages = baseline['stages'] if baseline else {}
+    print(f"{'Stage':<28}{'Calls':>8}{'Rows':>10}{'Seconds':>12}{'Peak MB':>10}" + (f"{'Change':>10}" if baseline else ''))
+    for name, entry in results['stages'].items():
+        line = f"{name:<28}{entry['calls']:>8}{entry['rows']:>10}{entry['seconds']:>12.3f}{entry['peak_mb']:>10.1f}"
+        previous = baseline_stages.get(name)
+        if previous and previous['seconds']:
+            line += f"{(entry['seconds'] / previous['seconds'] - 1) * 100:>+9.0f}%"
+        print(line)
+    print(f"Total {results['total_seconds']:.3f}s, "
+          f"{results['output_bytes'] / BYTES_PER_MB:.1f} MB workbook"
+          + (f", peak RSS {results['max_rss_mb']:.0f} MB" if results['max_rss_mb'] is not None else ''))
+    if baseline:
+        print(f"Baseline total {baseline['total_seconds']:.3f}s ({baseline.get('commit') or 'unknown commit'})")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the catalog export pipeline on synthetic inputs.")
+    parser.add_argument('--tables', type=int, default=DEFAULT_SCALE['tables'], help="Tables in the full V_CATALOG export")
+    parser.add_argument('--project-tables', type=int, default=DEFAULT_SCALE['project_tables'], help="Tables and scripts in scope of the project")
+    parser.add_argument('--columns', type=int, default=DEFAULT_SCALE['columns'], help="Columns per table")
+    parser.add_argument('--sql-lines', type=int, default=DEFAULT_SCALE['sql_lines'], help="Lines of SQL per script")
+    parser.add_argument('--tableau-fields', type=int, default=DEFAULT_SCALE['tableau_fields'], help="Calculated fields in tableau.csv")
+    parser.add_argument('--tableau-workbooks', type=int, default=DEFAULT_SCALE['tableau_workbooks'], help="Tableau workbooks to extract")
+    parser.add_argument('--engine', choices=WRITER_ENGINES, default='openpyxl', help="Writer engine")
+    parser.add_argument('--sql-layout', choices=SQL_LAYOUTS, default='lines', help="SQL layout")
+    parser.add_argument('--workers', type=int, default=1, help="Worker processes for the Tableau extractor")
+    parser.add_argument('--used-by', action='store_true', help="Also build the Used By sheet")
+    parser.add_argument('--work-dir', help="Keep the generated inputs and workbook in this folder instead of a temporary one")
+    parser.add_argument('--output', default=OUTPUT_FILE, help=f"Results file (default {OUTPUT_FILE})")
+    parser.add_argument('--compare', help="Earlier results file to compare against")
+    args = parser.parse_args(argv)
+
+    if args.sql_layout == 'merged' and args.engine == 'stream':
+        parser.error("The merged SQL layout needs the openpyxl engine")
+
+    scale = {
+        'tables': args.tables,
+        'project_tables': args.project_tables,
+        'columns': args.columns,
+        'sql_lines': args.sql_lines,
+        'tableau_fields': args.tableau_fields,
+        'tableau_workbooks': args.tableau_workbooks,
+    }
+
+    if args.work_dir:
+        results = run_benchmark(args.work_dir, scale, args.engine, args.sql_layout, args.workers, args.used_by)
+    else:
+        with tempfile.TemporaryDirectory() as work_dir:
+            results = run_benchmark(work_dir, scale, args.engine, args.sql_layout, args.workers, args.used_by)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+    print_results(results, baseline)
+
+    os.makedirs(os.path.dirname(args.output) or '.', exist_ok=True)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {args.output}")
+
+if __name__ == "__main__":
+    main()
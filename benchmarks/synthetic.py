@@ -0,0 +1,115 @@
+import csv
+import os
+import random
+from xml.sax.saxutils import quoteattr
+
+from modules.readers import V_CATALOG_DTYPES, SCRIPTS_DTYPES
+from modules.tableau import FIELDNAMES
+
+# Default scale of a synthetic catalog, roughly one project scoped out of a small warehouse
+DEFAULT_SCALE = {
+    'tables': 200,            # Tables in the full V_CATALOG export
+    'project_tables': 50,     # Tables in scope of the project
+    'columns': 20,            # Columns per table
+    'sql_lines': 60,          # Lines of TRANSFORMATION_SQL per script
+    'tableau_fields': 300,    # Calculated fields in tableau.csv
+    'tableau_workbooks': 5,   # .twb files for the Tableau extractor
+}
+
+DATA_TYPES = ['varchar(80)', 'int', 'date', 'numeric(10,2)', 'timestamp']
+SCHEMAS = ['ph_f_person', 'ph_d_person', 'ph_f_encounter']
+WORKBOOK_NAME = 'Synthetic Dashboard.twb'
+
+def table_name(i):
+    return f"SYN_DATASET_{i:05d}"
+
+def column_name(i):
+    return f"column_{i:03d}"
+
+def synthetic_sql(i, tables, sql_lines, rng):
+    # A script that reads two upstream tables and pads out to the requested number of lines
+    upstream = [tables[j] for j in rng.sample(range(len(tables)), min(2, len(tables)))]
+    lines = [f"SELECT a.{column_name(0)},"]
+    for line in range(max(sql_lines - 6, 0)):
+        lines.append(f"    CASE WHEN a.{column_name(line % 20)} IS NULL THEN b.{column_name((line + 1) % 20)} ELSE a.{column_name(line % 20)} END AS derived_{line},")
+    lines.append(f"    b.{column_name(1)}")
+    lines.append(f"FROM {SCHEMAS[i % len(SCHEMAS)]}.{upstream[0]} a")
+    lines.append(f"LEFT JOIN {upstream[-1]} b")
+    lines.append(f"    ON a.{column_name(0)} = b.{column_name(0)}")
+    lines.append(f"WHERE a.{column_name(2)} >= '2020-01-01';")
+    return '\n'.join(lines)
+
+def write_v_catalog(path, tables, columns, rng):
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(list(V_CATALOG_DTYPES))
+        for i, name in enumerate(tables):
+            for position in range(1, columns + 1):
+                writer.writerow([SCHEMAS[i % len(SCHEMAS)], name, column_name(position - 1), rng.choice(DATA_TYPES), position])
+
+def write_scripts(path, tables, all_tables, sql_lines, rng):
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(list(SCRIPTS_DTYPES))
+        for i, name in enumerate(tables):
+            writer.writerow([f"WORKFLOW_{i % 10}", name, i % 5 + 1, f"2024-{i % 12 + 1:02d}-01", synthetic_sql(i, all_tables, sql_lines, rng)])
+
+def write_tableau(path, fields, columns, rng):
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=FIELDNAMES)
+        writer.writeheader()
+        for i in range(fields):
+            calculation = f"SUM([{column_name(rng.randrange(columns))}]) / COUNTD([{column_name(rng.randrange(columns))}])"
+            if i:
+                calculation += f" + [Field {rng.randrange(i)}]"
+            writer.writerow({'Workbook': WORKBOOK_NAME, 'Data Source': f"Source {i % 3}", 'Field Name': f"Field {i}", 'Calculation': calculation, 'Data Type': 'real'})
+
+def write_twb(path, fields, columns, rng):
+    ids = [f"Calculation_{i:019d}" for i in range(fields)]
+    lines = ["<?xml version='1.0' encoding='utf-8' ?>", "<workbook version='18.1'>", "<datasources>"]
+    lines.append("<datasource caption='Synthetic Source' inline='true' name='federated.synthetic' version='18.1'>")
+    for i, calculation_id in enumerate(ids):
+        formula = f"SUM([{column_name(rng.randrange(columns))}])"
+        if i:
+            formula += f" + [{ids[rng.randrange(i)]}]"
+        lines.append(f"<column caption='Field {i}' datatype='real' name='[{calculation_id}]' role='measure' type='quantitative'>"
+                     f"<calculation class='tableau' formula={quoteattr(formula)}/></column>")
+    lines += ["</datasource>", "</datasources>", "<worksheets/>", "</workbook>"]
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('\n'.join(lines))
+
+def generate_inputs(root, scale=None, seed=0):
+    """
+    Write a synthetic set of the HEI exports, tableau.csv and .twb workbooks under root.
+
+    Returns the paths of the generated files, keyed like the project settings in projects.json.
+    """
+    scale = {**DEFAULT_SCALE, **(scale or {})}
+    rng = random.Random(seed)
+    input_folder = os.path.join(root, 'input')
+    tableau_folder = os.path.join(input_folder, 'tableau')
+    os.makedirs(tableau_folder, exist_ok=True)
+
+    all_tables = [table_name(i) for i in range(scale['tables'])]
+    project_tables = all_tables[:min(scale['project_tables'], len(all_tables))]
+
+    paths = {
+        'tables': os.path.join(input_folder, 'HEI_V_CATALOG_SYNTHETIC.csv'),
+        'scripts': os.path.join(input_folder, 'HEI_SYNTHETIC_SCRIPTS.csv'),
+        'v_catalog': os.path.join(input_folder, 'HEI_V_CATALOG.csv'),
+        'all_scripts': os.path.join(input_folder, 'HEI_ALL_SCRIPTS.csv'),
+        'tableau': os.path.join(input_folder, 'tableau.csv'),
+        'tableau_folder': tableau_folder,
+        'tableau_workbook': WORKBOOK_NAME,
+    }
+    write_v_catalog(paths['tables'], project_tables, scale['columns'], rng)
+    write_scripts(paths['scripts'], project_tables, all_tables, scale['sql_lines'], rng)
+    write_v_catalog(paths['v_catalog'], all_tables, scale['columns'], rng)
+    write_scripts(paths['all_scripts'], all_tables, all_tables, scale['sql_lines'], rng)
+    write_tableau(paths['tableau'], scale['tableau_fields'], scale['columns'], rng)
+
+    fields_per_workbook = max(scale['tableau_fields'] // max(scale['tableau_workbooks'], 1), 1)
+    for i in range(scale['tableau_workbooks']):
+        write_twb(os.path.join(tableau_folder, f"Synthetic {i:03d}.twb"), fields_per_workbook, scale['columns'], rng)
+
+    return paths
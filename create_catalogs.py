@@ -0,0 +1,47 @@
+"""
+This script builds the Excel catalog of every project listed in a config file.
+The shared HEI_V_CATALOG.csv, HEI_ALL_SCRIPTS.csv and tableau.csv are loaded
+once and reused for each project's workbook.
+
+To build every project in projects.json:
+    python create_catalogs.py
+
+To build selected projects from another config:
+    python create_catalogs.py --config my_projects.json --project ltclcs --project valproate
+
+To build the projects in parallel, one process per workbook:
+    python create_catalogs.py --workers 4
+
+To time each stage and write a JSON report to output/profile.json:
+    python create_catalogs.py --profile
+"""
+
+import argparse
+import sys
+from modules.batch import build_all
+from modules.profiling import add_profile_argument, profile_session
+
+CONFIG_FILE = 'projects.json'  # Config file listing the shared inputs and the projects to build
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build the Excel catalogs for the projects in a config file.")
+    parser.add_argument('--config', default=CONFIG_FILE, help="JSON config listing the shared inputs and projects")
+    parser.add_argument('--project', action='append', dest='projects', help="Only build this project (can be repeated)")
+    parser.add_argument('--workers', type=int, default=1, help="Number of worker processes building workbooks in parallel")
+    add_profile_argument(parser)
+    args = parser.parse_args(argv)
+    if args.workers < 1:
+        parser.error("--workers must be at least 1")
+
+    # With --workers, only the stages run by this process are profiled
+    try:
+        with profile_session(args.profile):
+            results = build_all(args.config, args.projects, args.workers)
+    except ValueError as e:
+        parser.error(str(e))
+
+    if any(result['error'] for result in results.values()):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -11,14 +11,20 @@ The Excel workbook includes:
 To run the script, simply execute it in your Python environment:
     python create_valproate_catalog.py
 
+To time each stage and write a JSON report to output/profile.json:
+    python create_valproate_catalog.py --profile
+
 The output will be saved in the specified output folder as an Excel file.
 """
 
+import argparse
 import os
 from openpyxl import Workbook
 from openpyxl.styles import NamedStyle, Font
-from modules.readers import read_csv_schema, read_csv_scripts, read_csv_tableau, read_additional_v_catalog, read_all_scripts
+from modules.readers import read_csv_schema, read_csv_scripts, read_csv_tableau, read_additional_v_catalog, read_all_scripts, in_scope_names
 from modules.excel_helpers import export_to_excel
+from modules.catalog_db import export_to_sqlite
+from modules.profiling import add_profile_argument, profile_session
 
 # Constants for file paths and settings
 CSV_FILE_TABLES = 'input/HEI_V_CATALOG_VALPROATE.csv'  # CSV file containing the dataset schema
@@ -29,9 +35,15 @@ CSV_FILE_ALL_SCRIPTS = 'input/HEI_ALL_SCRIPTS.csv'     # CSV file containing all
 TABLEAU_WORKBOOK = 'Valproate DEV.twb'                 # Constant for the workbook to filter
 OUTPUT_FOLDER = './output'                             # Folder where the output will be saved
 EXCEL_FILE_NAME = 'HEI_VALPROATE.xlsx'                 # Name of the Excel file to export
+SQLITE_FILE_NAME = 'HEI_VALPROATE.db'                  # Searchable SQLite copy of the catalog, or None to skip it
 TABLE_STYLE = 'TableStyleLight8'                       # Excel table style to apply for data tables
 INDEX_TABLE_STYLE = 'TableStyleLight8'                 # Excel table style to apply for index tables
 FONT_NAME = 'Aptos'                                    # Font to be used globally
+SQL_LAYOUT = 'lines'                                   # 'lines' (one SQL line per row) or 'merged' (legacy merged block)
+WRITER_ENGINE = 'openpyxl'                             # 'openpyxl' (in memory) or 'stream' (constant memory, sheets streamed to disk)
+MAX_SHEETS_PER_WORKBOOK = None                         # Split dataset and script sheets into workbooks of this many sheets, or None for one workbook
+INCREMENTAL = True                                     # Only rewrite the workbooks whose datasets or scripts changed since the last run
+USED_BY = False                                        # Add the Used By sheet linking dataset columns to Tableau calculated fields
 
 # Constants for header strings
 HEADER_INSTRUCTIONS = "This document contains details of the datasets and scripts used to create the Valproate dashboard."
@@ -40,7 +52,7 @@ HEADER_DATASETS = "Datasets used to create the Valproate Dashboard following ful
 HEADER_SCRIPTS = "Scripts used to create each dataset in the Valproate Workflow"
 TABLEAU_HEADING = 'Tableau Calculated Fields for Valproate Dashboard'
 
-def main():
+def create_catalog():
     # Ensure output folder exists
     if not os.path.exists(OUTPUT_FOLDER):
         os.makedirs(OUTPUT_FOLDER)
@@ -49,8 +61,9 @@ def main():
     tables = read_csv_schema(CSV_FILE_TABLES)
     scripts = read_csv_scripts(CSV_FILE_SCRIPTS)
     tableau_fields = read_csv_tableau(CSV_FILE_TABLEAU, TABLEAU_WORKBOOK)
-    additional_v_catalog = read_additional_v_catalog(CSV_FILE_V_CATALOG)
-    all_scripts = read_all_scripts(CSV_FILE_ALL_SCRIPTS)
+    in_scope = in_scope_names(tables, scripts)
+    additional_v_catalog = read_additional_v_catalog(CSV_FILE_V_CATALOG, in_scope)
+    all_scripts = read_all_scripts(CSV_FILE_ALL_SCRIPTS, in_scope)
 
     # Define header style
     header_style = NamedStyle(name="header_style")
@@ -59,9 +72,22 @@ def main():
     # Export to Excel
     excel_file_path = os.path.join(OUTPUT_FOLDER, EXCEL_FILE_NAME)
 
-    export_to_excel(tables, scripts, tableau_fields, additional_v_catalog, all_scripts, excel_file_path, header_style, INDEX_TABLE_STYLE, TABLE_STYLE, HEADER_INSTRUCTIONS, HEADER_NAVIGATION, HEADER_DATASETS, HEADER_SCRIPTS, TABLEAU_HEADING)
+    export_to_excel(tables, scripts, tableau_fields, additional_v_catalog, all_scripts, excel_file_path, header_style, INDEX_TABLE_STYLE, TABLE_STYLE, HEADER_INSTRUCTIONS, HEADER_NAVIGATION, HEADER_DATASETS, HEADER_SCRIPTS, TABLEAU_HEADING, sql_layout=SQL_LAYOUT, engine=WRITER_ENGINE, max_sheets=MAX_SHEETS_PER_WORKBOOK, incremental=INCREMENTAL, used_by=USED_BY)
 
     print(f"Schema and scripts exported to {excel_file_path}")
 
+    if SQLITE_FILE_NAME:
+        sqlite_file_path = os.path.join(OUTPUT_FOLDER, SQLITE_FILE_NAME)
+        export_to_sqlite(additional_v_catalog, scripts, tableau_fields, sqlite_file_path, in_scope)
+        print(f"Searchable catalog exported to {sqlite_file_path}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export the Valproate dataset catalog to Excel.")
+    add_profile_argument(parser)
+    args = parser.parse_args(argv)
+
+    with profile_session(args.profile):
+        create_catalog()
+
 if __name__ == "__main__":
     main()
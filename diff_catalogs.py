@@ -0,0 +1,75 @@
+"""
+This script reports what changed between two snapshots of the HEI exports.
+Each snapshot is a folder holding HEI_V_CATALOG.csv and HEI_ALL_SCRIPTS.csv.
+Tables, columns, data types and scripts that were added, removed or changed
+are printed as a summary and written to a "Changes" sheet.
+
+Keep a copy of the exports before refreshing them, e.g. in input/previous,
+then compare it with the refreshed input folder:
+    python diff_catalogs.py input/previous
+
+To compare two other snapshots and choose the report file:
+    python diff_catalogs.py snapshots/2024-01 snapshots/2024-02 --output output/changes.xlsx
+
+A report path ending in .csv is written as CSV instead of a workbook.
+"""
+
+import argparse
+import os
+from modules.profiling import add_profile_argument, profile_session
+
+# Constants for file names and formatting
+V_CATALOG_FILE = 'HEI_V_CATALOG.csv'                # Full V_CATALOG export in each snapshot folder
+ALL_SCRIPTS_FILE = 'HEI_ALL_SCRIPTS.csv'            # Full scripts export in each snapshot folder
+NEW_SNAPSHOT = 'input'                              # Snapshot compared against when only the old one is given
+OUTPUT_FILE = 'output/HEI_CATALOG_CHANGES.xlsx'     # Changes report
+TABLE_STYLE = 'TableStyleLight8'                    # Excel table style to apply for the changes table
+FONT_NAME = 'Aptos'                                 # Font of the report heading
+
+def read_snapshot(folder):
+    from modules.readers import read_additional_v_catalog, read_all_scripts
+
+    for file_name in (V_CATALOG_FILE, ALL_SCRIPTS_FILE):
+        if not os.path.exists(os.path.join(folder, file_name)):
+            raise FileNotFoundError(f"{folder} has no {file_name}")
+    return read_additional_v_catalog(os.path.join(folder, V_CATALOG_FILE)), read_all_scripts(os.path.join(folder, ALL_SCRIPTS_FILE))
+
+def compare(args):
+    # pandas and openpyxl are imported when a comparison runs, not when the script is loaded
+    from openpyxl.styles import NamedStyle, Font
+    from modules.catalog_diff import diff_catalogs, summarize_changes, write_changes_workbook
+
+    old_catalog, old_scripts = read_snapshot(args.old)
+    new_catalog, new_scripts = read_snapshot(args.new)
+    changes = diff_catalogs(old_catalog, old_scripts, new_catalog, new_scripts)
+
+    print(f"Changes from {args.old} to {args.new}")
+    for line in summarize_changes(changes):
+        print(f"  {line}")
+
+    os.makedirs(os.path.dirname(args.output) or '.', exist_ok=True)
+    if args.output.lower().endswith('.csv'):
+        changes.to_csv(args.output, index=False)
+    else:
+        header_style = NamedStyle(name="header_style")
+        header_style.font = Font(name=FONT_NAME, size=14, bold=True)
+        write_changes_workbook(changes, args.output, header_style, TABLE_STYLE, f"Changes from {args.old} to {args.new}")
+    print(f"Changes report written to {args.output}")
+    return changes
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Report the tables, columns and scripts that changed between two snapshots of the HEI exports.")
+    parser.add_argument('old', help="Folder holding the earlier HEI_V_CATALOG.csv and HEI_ALL_SCRIPTS.csv")
+    parser.add_argument('new', nargs='?', default=NEW_SNAPSHOT, help=f"Folder holding the later exports (default {NEW_SNAPSHOT})")
+    parser.add_argument('--output', default=OUTPUT_FILE, help=f"Report file, .xlsx or .csv (default {OUTPUT_FILE})")
+    add_profile_argument(parser)
+    args = parser.parse_args(argv)
+
+    try:
+        with profile_session(args.profile):
+            compare(args)
+    except FileNotFoundError as e:
+        parser.error(str(e))
+
+if __name__ == "__main__":
+    main()
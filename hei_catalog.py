@@ -0,0 +1,125 @@
+"""
+This script is a single entry point for every step of the catalog export.
+Each subcommand imports pandas, openpyxl and lxml only when it runs, so --help,
+checking a config and listing projects start without loading them.
+
+To extract the Tableau calculated fields into output/tableau.csv:
+    python hei_catalog.py extract-tableau --workers 4
+
+To build one project catalog with its script's settings:
+    python hei_catalog.py build ltclcs
+
+To build, check or list the projects of projects.json:
+    python hei_catalog.py batch --workers 4
+    python hei_catalog.py batch --check
+    python hei_catalog.py batch --list
+
+To compare a saved snapshot of the full exports with the input folder:
+    python hei_catalog.py diff input/previous
+
+To inspect or clear the parsed input cache:
+    python hei_catalog.py cache info
+    python hei_catalog.py cache clear
+
+extract-tableau, build, batch and diff accept --profile to time each stage.
+"""
+
+import argparse
+import importlib
+import os
+import sys
+from diff_catalogs import NEW_SNAPSHOT, OUTPUT_FILE as CHANGES_FILE, compare
+from modules.profiling import add_profile_argument, profile_session
+
+# Project scripts run by the build subcommand
+BUILD_SCRIPTS = {
+    'ltclcs': 'create_ltclcs_catalog',
+    'valproate': 'create_valproate_catalog',
+}
+CONFIG_FILE = 'projects.json'  # Config file listing the shared inputs and the projects to build
+
+def extract_tableau(args):
+    from extract_tableau_calculations import extract
+    extract(args)
+
+def build(args):
+    importlib.import_module(BUILD_SCRIPTS[args.project]).create_catalog()
+
+def list_projects(projects):
+    for project in projects:
+        scope = f"roots {', '.join(project['roots'])}" if 'roots' in project else f"{project['tables']}, {project['scripts']}"
+        print(f"{project['name']}: {os.path.join(project['output_folder'], project['excel_file_name'])} from {scope}")
+
+def batch(args):
+    from modules.config import load_config, select_projects
+
+    shared, projects = load_config(args.config)
+    projects = select_projects(projects, args.projects)
+    if args.list:
+        list_projects(projects)
+        return
+    if args.check:
+        print(f"{args.config}: {len(projects)} project{'s' if len(projects) != 1 else ''} configured correctly")
+        return
+
+    from modules.batch import build_all
+    results = build_all(args.config, args.projects, args.workers)
+    if any(result['error'] for result in results.values()):
+        sys.exit(1)
+
+def cache(args):
+    from modules.cache import CACHE_FOLDER, clear_cache, print_cache_info
+
+    if args.command == 'info':
+        print_cache_info()
+    else:
+        print(f"Removed {clear_cache()} files from {CACHE_FOLDER}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Extract, build, compare and cache the HEI dataset and query catalogs.")
+    subparsers = parser.add_subparsers(dest='subcommand', required=True)
+
+    extract_parser = subparsers.add_parser('extract-tableau', help="Extract Tableau calculated fields into output/tableau.csv")
+    extract_parser.add_argument('--workers', type=int, default=None, help="Number of worker processes (defaults to the number of CPUs)")
+    extract_parser.add_argument('--full', action='store_true', help="Re-extract every workbook instead of reusing cached results")
+    extract_parser.add_argument('--dependencies', action='store_true', help="Also write the field dependency graph next to tableau.csv")
+    add_profile_argument(extract_parser)
+    extract_parser.set_defaults(handler=extract_tableau)
+
+    build_parser = subparsers.add_parser('build', help="Build one project catalog with its script's settings")
+    build_parser.add_argument('project', choices=sorted(BUILD_SCRIPTS), help="Project to build")
+    add_profile_argument(build_parser)
+    build_parser.set_defaults(handler=build)
+
+    batch_parser = subparsers.add_parser('batch', help="Build the projects of a config file")
+    batch_parser.add_argument('--config', default=CONFIG_FILE, help="JSON config listing the shared inputs and projects")
+    batch_parser.add_argument('--project', action='append', dest='projects', help="Only build this project (can be repeated)")
+    batch_parser.add_argument('--workers', type=int, default=1, help="Number of worker processes building workbooks in parallel")
+    batch_parser.add_argument('--list', action='store_true', help="List the configured projects without building them")
+    batch_parser.add_argument('--check', action='store_true', help="Validate the config without building")
+    add_profile_argument(batch_parser)
+    batch_parser.set_defaults(handler=batch)
+
+    diff_parser = subparsers.add_parser('diff', help="Report what changed between two snapshots of the full exports")
+    diff_parser.add_argument('old', help="Folder holding the earlier HEI_V_CATALOG.csv and HEI_ALL_SCRIPTS.csv")
+    diff_parser.add_argument('new', nargs='?', default=NEW_SNAPSHOT, help=f"Folder holding the later exports (default {NEW_SNAPSHOT})")
+    diff_parser.add_argument('--output', default=CHANGES_FILE, help=f"Report file, .xlsx or .csv (default {CHANGES_FILE})")
+    add_profile_argument(diff_parser)
+    diff_parser.set_defaults(handler=compare)
+
+    cache_parser = subparsers.add_parser('cache', help="Inspect or clear the parsed input cache")
+    cache_parser.add_argument('command', choices=['info', 'clear'])
+    cache_parser.set_defaults(handler=cache, profile=None)
+
+    args = parser.parse_args(argv)
+    if getattr(args, 'workers', None) is not None and args.workers < 1:
+        parser.error("--workers must be at least 1")
+
+    try:
+        with profile_session(args.profile):
+            args.handler(args)
+    except (ValueError, FileNotFoundError) as e:
+        parser.error(str(e))
+
+if __name__ == "__main__":
+    main()
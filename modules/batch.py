@@ -0,0 +1,105 @@
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from openpyxl.styles import NamedStyle, Font
+from modules.readers import read_csv_schema, read_csv_scripts, read_all_tableau, read_additional_v_catalog, read_all_scripts, in_scope_names
+from modules.excel_helpers import build_catalog_index, export_to_excel
+from modules.catalog_db import export_to_sqlite
+from modules.config import load_config, select_projects
+from modules.lineage import build_lineage_graph, scope_project
+from modules.profiling import profiled
+
+@profiled()
+def load_shared_inputs(shared):
+    # The full catalog, scripts and Tableau fields are read and indexed once for every project
+    additional_v_catalog = read_additional_v_catalog(shared['v_catalog'])
+    all_scripts = read_all_scripts(shared['all_scripts'])
+    return {
+        'additional_v_catalog': additional_v_catalog,
+        'all_scripts': all_scripts,
+        'tableau': read_all_tableau(shared['tableau']),
+        'catalog_index': build_catalog_index(additional_v_catalog, all_scripts),
+    }
+
+@profiled()
+def build_project(project, shared_inputs):
+    os.makedirs(project['output_folder'], exist_ok=True)
+
+    if 'roots' in project:
+        # The lineage graph is built the first time a project needs it and shared by the rest
+        if 'lineage_graph' not in shared_inputs:
+            shared_inputs['lineage_graph'] = build_lineage_graph(shared_inputs['all_scripts'], shared_inputs['catalog_index']['columns'])
+        tables, scripts = scope_project(shared_inputs['additional_v_catalog'], shared_inputs['all_scripts'], project['roots'], shared_inputs['lineage_graph'])
+    else:
+        tables = read_csv_schema(project['tables'])
+        scripts = read_csv_scripts(project['scripts'])
+    tableau = shared_inputs['tableau']
+    tableau_fields = tableau[tableau['Workbook'] == project['tableau_workbook']]
+
+    header_style = NamedStyle(name="header_style")
+    header_style.font = Font(name=project['font_name'], size=14, bold=True)
+
+    excel_file_path = os.path.join(project['output_folder'], project['excel_file_name'])
+    export_to_excel(tables, scripts, tableau_fields, shared_inputs['additional_v_catalog'], shared_inputs['all_scripts'], excel_file_path, header_style, project['index_table_style'], project['table_style'], project['header_instructions'], project['header_navigation'], project['header_datasets'], project['header_scripts'], project['tableau_heading'], catalog_index=shared_inputs['catalog_index'], sql_layout=project.get('sql_layout', 'lines'), engine=project.get('engine', 'openpyxl'), max_sheets=project.get('max_sheets'), max_cells=project.get('max_cells'), workers=project.get('shard_workers'), incremental=project.get('incremental', False), used_by=project.get('used_by', False))
+
+    # A project with a sqlite_file_name also gets a searchable copy of its catalog
+    if project.get('sqlite_file_name'):
+        sqlite_file_path = os.path.join(project['output_folder'], project['sqlite_file_name'])
+        export_to_sqlite(shared_inputs['additional_v_catalog'], scripts, tableau_fields, sqlite_file_path, in_scope_names(tables, scripts))
+    return excel_file_path
+
+# Shared inputs of a pool worker, loaded once by its initializer
+_worker_inputs = None
+
+def _init_worker(shared):
+    global _worker_inputs
+    _worker_inputs = load_shared_inputs(shared)
+
+def _build_in_worker(project):
+    return build_project(project, _worker_inputs)
+
+def _build_serial(projects, shared):
+    shared_inputs = load_shared_inputs(shared)
+    for project in projects:
+        try:
+            yield project['name'], build_project(project, shared_inputs), None
+        except Exception as e:
+            yield project['name'], None, f"{type(e).__name__}: {e}"
+
+def _build_parallel(projects, shared, workers):
+    # Parse the shared inputs once here so each worker loads them from the on-disk cache
+    # instead of receiving pickled DataFrames with every task
+    read_additional_v_catalog(shared['v_catalog'])
+    read_all_scripts(shared['all_scripts'])
+    read_all_tableau(shared['tableau'])
+
+    # Projects are already built in parallel, so each one renders its shards serially
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(shared,)) as pool:
+        futures = {pool.submit(_build_in_worker, {**project, 'shard_workers': 1}): project['name'] for project in projects}
+        for future in as_completed(futures):
+            try:
+                yield futures[future], future.result(), None
+            except Exception as e:
+                yield futures[future], None, f"{type(e).__name__}: {e}"
+
+def build_all(config_path, project_names=None, workers=1):
+    shared, projects = load_config(config_path)
+    projects = select_projects(projects, project_names)
+
+    workers = min(workers, len(projects))
+    if workers > 1:
+        built = _build_parallel(projects, shared, workers)
+    else:
+        built = _build_serial(projects, shared)
+
+    # One failing project is reported without aborting the rest of the batch
+    results = {}
+    for name, output_path, error in built:
+        results[name] = {'output': output_path, 'error': error}
+        if error:
+            print(f"{name}: FAILED - {error}")
+        else:
+            print(f"{name}: schema and scripts exported to {output_path}")
+
+    failed = [name for name, result in results.items() if result['error']]
+    print(f"{len(results) - len(failed)} of {len(results)} projects built" + (f", failed: {', '.join(failed)}" if failed else ""))
+    return results
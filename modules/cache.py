@@ -0,0 +1,133 @@
+"""
+On-disk cache of parsed input files.
+
+Each entry is the pickled result of a reader, keyed by the source file's path,
+size and modification time. Entries for a source that has since changed are
+evicted the next time that source is read.
+
+To inspect or clear the cache:
+    python -m modules.cache info
+    python -m modules.cache clear
+"""
+
+import argparse
+import glob
+import hashlib
+import importlib.metadata
+import json
+import os
+import pickle
+import shutil
+import time
+from functools import lru_cache
+
+CACHE_FOLDER = '.cache'  # Folder where parsed inputs are cached
+# Bump when a reader's output changes so entries written by older code are parsed again
+CACHE_VERSION = 1
+
+def _digest(*parts):
+    return hashlib.sha1('\0'.join(str(part) for part in parts).encode('utf-8')).hexdigest()[:16]
+
+def names_digest(names):
+    # Short stable key for a set of in-scope names
+    return _digest(*sorted(names))
+
+@lru_cache(maxsize=None)
+def _format_version():
+    # Pickled DataFrames may not load under another pandas version, so entries are keyed by it
+    return f"{CACHE_VERSION}-{importlib.metadata.version('pandas')}"
+
+def _evict_stale(source_key, fingerprint):
+    for path in glob.glob(os.path.join(CACHE_FOLDER, f"{source_key}-*")):
+        if not os.path.basename(path).split('.')[0].endswith(f"-{fingerprint}"):
+            os.remove(path)
+
+def load_cached(file_path, variant, loader):
+    file_path = os.path.abspath(file_path)
+    stat = os.stat(file_path)
+    source_key = _digest(file_path)
+    fingerprint = _digest(stat.st_size, stat.st_mtime_ns, _format_version())
+    entry_name = f"{source_key}-{variant}-{fingerprint}"
+    entry_path = os.path.join(CACHE_FOLDER, f"{entry_name}.pkl")
+
+    if os.path.exists(entry_path):
+        try:
+            with open(entry_path, 'rb') as f:
+                return pickle.load(f)
+        except Exception:
+            # A truncated entry, or one pickled by incompatible library code, is parsed again below
+            pass
+
+    _evict_stale(source_key, fingerprint)
+    result = loader()
+
+    os.makedirs(CACHE_FOLDER, exist_ok=True)
+    temp_path = f"{entry_path}.{os.getpid()}.tmp"
+    with open(temp_path, 'wb') as f:
+        pickle.dump(result, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(temp_path, entry_path)
+
+    metadata = {
+        'source': file_path,
+        'variant': variant,
+        'size': stat.st_size,
+        'mtime': stat.st_mtime,
+        'created': time.time(),
+    }
+    with open(os.path.join(CACHE_FOLDER, f"{entry_name}.json"), 'w', encoding='utf-8') as f:
+        json.dump(metadata, f)
+
+    return result
+
+def cache_entries():
+    entries = []
+    for metadata_path in sorted(glob.glob(os.path.join(CACHE_FOLDER, '*.json'))):
+        entry_path = metadata_path[:-len('.json')] + '.pkl'
+        if not os.path.exists(entry_path):
+            continue
+        with open(metadata_path, encoding='utf-8') as f:
+            metadata = json.load(f)
+        metadata['entry'] = entry_path
+        metadata['entry_size'] = os.path.getsize(entry_path)
+        if os.path.exists(metadata['source']):
+            stat = os.stat(metadata['source'])
+            metadata['stale'] = (stat.st_size, stat.st_mtime) != (metadata['size'], metadata['mtime'])
+        else:
+            metadata['stale'] = True
+        entries.append(metadata)
+    return entries
+
+def clear_cache():
+    removed = 0
+    for path in glob.glob(os.path.join(CACHE_FOLDER, '*')):
+        if os.path.isdir(path):
+            shutil.rmtree(path)
+        else:
+            os.remove(path)
+        removed += 1
+    return removed
+
+def print_cache_info():
+    entries = cache_entries()
+    if not entries:
+        print(f"No cached inputs in {CACHE_FOLDER}")
+        return
+    for entry in entries:
+        created = time.strftime('%Y-%m-%d %H:%M', time.localtime(entry['created']))
+        status = 'stale' if entry['stale'] else 'fresh'
+        print(f"{entry['source']} [{entry['variant']}] {entry['entry_size'] / 1e6:.1f} MB, cached {created}, {status}")
+    total_size = sum(entry['entry_size'] for entry in entries)
+    print(f"{len(entries)} cached inputs, {total_size / 1e6:.1f} MB in {CACHE_FOLDER}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Inspect or clear the parsed input cache.")
+    parser.add_argument('command', choices=['info', 'clear'])
+    args = parser.parse_args(argv)
+
+    if args.command == 'info':
+        print_cache_info()
+    else:
+        print(f"Removed {clear_cache()} files from {CACHE_FOLDER}")
+
+if __name__ == "__main__":
+    main()
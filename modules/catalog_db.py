@@ -0,0 +1,134 @@
+import os
+import sqlite3
+from modules.profiling import profiled
+
+# Tables of the SQLite catalog, with full-text indexes over the SQL and the Tableau calculations.
+# Underscores are part of a token so identifiers such as ph_f_person are matched whole.
+SCHEMA = """
+CREATE TABLE columns (
+    table_schema TEXT,
+    table_name TEXT NOT NULL COLLATE NOCASE,
+    column_name TEXT NOT NULL COLLATE NOCASE,
+    data_type TEXT,
+    ordinal_position INTEGER
+);
+CREATE TABLE scripts (
+    id INTEGER PRIMARY KEY,
+    workflow_name TEXT,
+    data_set_mnemonic TEXT NOT NULL COLLATE NOCASE,
+    data_set_version INTEGER,
+    date_modified TEXT,
+    transformation_sql TEXT
+);
+CREATE TABLE tableau_fields (
+    id INTEGER PRIMARY KEY,
+    workbook TEXT,
+    data_source TEXT,
+    field_name TEXT NOT NULL COLLATE NOCASE,
+    calculation TEXT,
+    data_type TEXT
+);
+CREATE VIRTUAL TABLE scripts_fts USING fts5(
+    data_set_mnemonic, transformation_sql,
+    content='scripts', content_rowid='id', tokenize="unicode61 tokenchars '_'"
+);
+CREATE VIRTUAL TABLE tableau_fts USING fts5(
+    field_name, calculation,
+    content='tableau_fields', content_rowid='id', tokenize="unicode61 tokenchars '_'"
+);
+CREATE VIEW datasets AS
+    SELECT table_schema, table_name, COUNT(*) AS column_count FROM columns GROUP BY table_schema, table_name;
+"""
+
+# Indexes are created after the bulk insert, which is faster than maintaining them row by row.
+# Names are compared case-insensitively, so LIKE searches on them can use the indexes.
+INDEXES = """
+CREATE INDEX columns_table ON columns (table_name, ordinal_position);
+CREATE INDEX columns_name ON columns (column_name);
+CREATE INDEX scripts_mnemonic ON scripts (data_set_mnemonic);
+CREATE INDEX tableau_fields_name ON tableau_fields (field_name);
+INSERT INTO scripts_fts (scripts_fts) VALUES ('rebuild');
+INSERT INTO tableau_fts (tableau_fts) VALUES ('rebuild');
+"""
+
+SEARCH_TARGETS = ('scripts', 'tableau', 'columns')
+
+QUERIES = {
+    'scripts': """
+        SELECT s.data_set_mnemonic, s.workflow_name, snippet(scripts_fts, 1, '>>', '<<', '...', 12)
+        FROM scripts_fts JOIN scripts s ON s.id = scripts_fts.rowid
+        WHERE scripts_fts MATCH ? ORDER BY rank LIMIT ?""",
+    'tableau': """
+        SELECT t.workbook, t.data_source, t.field_name, snippet(tableau_fts, 1, '>>', '<<', '...', 12)
+        FROM tableau_fts JOIN tableau_fields t ON t.id = tableau_fts.rowid
+        WHERE tableau_fts MATCH ? ORDER BY rank LIMIT ?""",
+    'columns': """
+        SELECT table_schema, table_name, column_name, data_type
+        FROM columns WHERE column_name LIKE ? ORDER BY table_name, ordinal_position LIMIT ?""",
+}
+
+def _records(df, columns):
+    # Plain tuples with missing values as NULL
+    values = df[columns].astype(object)
+    return values.where(values.notna(), None).itertuples(index=False, name=None)
+
+@profiled()
+def export_to_sqlite(catalog, scripts, tableau_fields, output_path, table_names=None):
+    """
+    Write V_CATALOG columns, scripts and Tableau fields to a searchable SQLite database.
+
+    table_names limits the catalog to the tables in scope, as the project workbooks do.
+    The database is built in a temporary file and swapped in once complete.
+    """
+    if table_names is not None:
+        catalog = catalog[catalog['table_name'].isin(set(table_names))]
+
+    temp_path = f"{output_path}.{os.getpid()}.tmp"
+    if os.path.exists(temp_path):
+        os.remove(temp_path)
+
+    connection = sqlite3.connect(temp_path)
+    try:
+        # Nothing to recover if the build fails, so skip the journal and fsyncs
+        connection.execute("PRAGMA journal_mode = OFF")
+        connection.execute("PRAGMA synchronous = OFF")
+        connection.executescript(SCHEMA)
+        with connection:
+            connection.executemany(
+                "INSERT INTO columns VALUES (?, ?, ?, ?, ?)",
+                _records(catalog, ['table_schema', 'table_name', 'column_name', 'data_type', 'ordinal_position']))
+            connection.executemany(
+                "INSERT INTO scripts (workflow_name, data_set_mnemonic, data_set_version, date_modified, transformation_sql) VALUES (?, ?, ?, ?, ?)",
+                _records(scripts, ['WORKFLOW_NAME', 'DATA_SET_MNEMONIC', 'DATA_SET_VERSION', 'DATE_MODIFIED', 'TRANSFORMATION_SQL']))
+            connection.executemany(
+                "INSERT INTO tableau_fields (workbook, data_source, field_name, calculation, data_type) VALUES (?, ?, ?, ?, ?)",
+                _records(tableau_fields, ['Workbook', 'Data Source', 'Field Name', 'Calculation', 'Data Type']))
+        connection.executescript(INDEXES)
+        connection.execute("ANALYZE")
+    finally:
+        connection.close()
+
+    os.replace(temp_path, output_path)
+    return output_path
+
+def fts_phrase(text):
+    # Search for the text as a phrase, so punctuation such as dots and brackets is not read as query syntax
+    return '"{}"'.format(text.replace('"', '""'))
+
+def search(db_path, text, target='scripts', limit=50, raw=False):
+    if target not in SEARCH_TARGETS:
+        raise ValueError(f"Unknown search target '{target}', expected one of {', '.join(SEARCH_TARGETS)}")
+    if not os.path.exists(db_path):
+        raise FileNotFoundError(f"No catalog database at {db_path}")
+
+    if target == 'columns':
+        # Column names are matched case-insensitively, with * as a wildcard
+        term = text.replace('*', '%')
+    else:
+        term = text if raw else fts_phrase(text)
+
+    connection = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    try:
+        return connection.execute(QUERIES[target], (term, limit)).fetchall()
+    finally:
+        connection.close()
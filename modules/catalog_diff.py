@@ -0,0 +1,155 @@
+import difflib
+import pandas as pd
+from modules.profiling import profiled
+from modules.writers import WorkbookWriter, styled
+
+# Rows are matched on these keys between two snapshots
+TABLE_KEY = ['table_schema', 'table_name']
+COLUMN_KEY = ['table_schema', 'table_name', 'column_name']
+COLUMN_FIELDS = ['data_type', 'ordinal_position']
+SCRIPT_KEY = ['DATA_SET_MNEMONIC']
+SCRIPT_FIELDS = ['WORKFLOW_NAME', 'DATA_SET_VERSION', 'DATE_MODIFIED']
+
+CHANGE_COLUMNS = ['kind', 'change', 'group', 'name', 'column', 'before', 'after']
+CHANGE_HEADERS = ["Kind", "Change", "Schema / Workflow", "Table / Mnemonic", "Column", "Before", "After"]
+CHANGES_SHEET = "Changes"
+
+def _hashes(df, columns):
+    # One 64-bit hash per row, computed a column at a time by pandas
+    return pd.util.hash_pandas_object(df[columns], index=False).to_numpy()
+
+def _isin(values, others):
+    return pd.Index(values).isin(others)
+
+def _unique_rows(df, key):
+    # First row of each key, and the key hashes of the rows kept
+    keys = _hashes(df, key)
+    first = ~pd.Index(keys).duplicated()
+    return df[first], keys[first]
+
+def _align(old, old_keys, new, new_keys):
+    # Rows of both snapshots with the same key, in the new snapshot's order
+    positions = pd.Index(old_keys).get_indexer(new_keys)
+    shared = positions >= 0
+    return old.iloc[positions[shared]], new[shared]
+
+def _text(value):
+    return None if pd.isna(value) else str(value)
+
+def _diff_tables(old, new):
+    old_tables = _hashes(old, TABLE_KEY)
+    new_tables = _hashes(new, TABLE_KEY)
+    changes = []
+    for change, df, mask, side in (('added', new, ~_isin(new_tables, old_tables), 'after'),
+                                   ('removed', old, ~_isin(old_tables, new_tables), 'before')):
+        sizes = df[mask].groupby(TABLE_KEY, observed=True, sort=False).size()
+        for (schema, table_name), size in sizes.items():
+            summary = f"{size} column{'s' if size != 1 else ''}"
+            changes.append(('table', change, schema, table_name, None,
+                            summary if side == 'before' else None, summary if side == 'after' else None))
+    return changes
+
+def _diff_columns(old, new):
+    old, old_keys = _unique_rows(old, COLUMN_KEY)
+    new, new_keys = _unique_rows(new, COLUMN_KEY)
+    old_tables = _hashes(old, TABLE_KEY)
+    new_tables = _hashes(new, TABLE_KEY)
+    changes = []
+
+    # Columns of added or removed tables are covered by the table change
+    for change, df, mask in (('added', new, ~_isin(new_keys, old_keys) & _isin(new_tables, old_tables)),
+                             ('removed', old, ~_isin(old_keys, new_keys) & _isin(old_tables, new_tables))):
+        for schema, table_name, column_name, data_type in df.loc[mask, COLUMN_KEY + ['data_type']].itertuples(index=False, name=None):
+            type_text = _text(data_type)
+            changes.append(('column', change, schema, table_name, column_name,
+                            type_text if change == 'removed' else None, type_text if change == 'added' else None))
+
+    # Only the columns whose field hashes differ are compared value by value
+    before, after = _align(old, old_keys, new, new_keys)
+    differs = _hashes(before, COLUMN_FIELDS) != _hashes(after, COLUMN_FIELDS)
+    for old_row, new_row in zip(before[differs].itertuples(index=False), after[differs].itertuples(index=False)):
+        if _text(old_row.data_type) != _text(new_row.data_type):
+            changes.append(('column', 'type changed', new_row.table_schema, new_row.table_name, new_row.column_name,
+                            _text(old_row.data_type), _text(new_row.data_type)))
+        else:
+            changes.append(('column', 'moved', new_row.table_schema, new_row.table_name, new_row.column_name,
+                            f"position {old_row.ordinal_position}", f"position {new_row.ordinal_position}"))
+    return changes
+
+def _sql_line_changes(old_sql, new_sql):
+    old_lines = (old_sql or '').splitlines()
+    new_lines = (new_sql or '').splitlines()
+    added = removed = 0
+    for tag, i1, i2, j1, j2 in difflib.SequenceMatcher(None, old_lines, new_lines, autojunk=False).get_opcodes():
+        if tag != 'equal':
+            removed += i2 - i1
+            added += j2 - j1
+    return f"{len(old_lines)} lines", f"{len(new_lines)} lines, {added} added, {removed} removed"
+
+def _diff_scripts(old, new):
+    # Mnemonics are looked up by their first script, as the catalog index does
+    old, old_keys = _unique_rows(old.dropna(subset=SCRIPT_KEY), SCRIPT_KEY)
+    new, new_keys = _unique_rows(new.dropna(subset=SCRIPT_KEY), SCRIPT_KEY)
+    changes = []
+
+    for change, df, mask in (('added', new, ~_isin(new_keys, old_keys)), ('removed', old, ~_isin(old_keys, new_keys))):
+        for mnemonic, workflow_name in df.loc[mask, ['DATA_SET_MNEMONIC', 'WORKFLOW_NAME']].itertuples(index=False, name=None):
+            changes.append(('script', change, _text(workflow_name), mnemonic, None, None, None))
+
+    before, after = _align(old, old_keys, new, new_keys)
+    sql_differs = _hashes(before, ['TRANSFORMATION_SQL']) != _hashes(after, ['TRANSFORMATION_SQL'])
+    fields_differ = _hashes(before, SCRIPT_FIELDS) != _hashes(after, SCRIPT_FIELDS)
+    for old_row, new_row in zip(before[sql_differs].to_dict('records'), after[sql_differs].to_dict('records')):
+        old_summary, new_summary = _sql_line_changes(_text(old_row['TRANSFORMATION_SQL']), _text(new_row['TRANSFORMATION_SQL']))
+        changes.append(('script', 'sql changed', _text(new_row['WORKFLOW_NAME']), new_row['DATA_SET_MNEMONIC'], None, old_summary, new_summary))
+    for old_row, new_row in zip(before[fields_differ].to_dict('records'), after[fields_differ].to_dict('records')):
+        fields = [field for field in SCRIPT_FIELDS if _text(old_row[field]) != _text(new_row[field])]
+        changes.append(('script', 'details changed', _text(new_row['WORKFLOW_NAME']), new_row['DATA_SET_MNEMONIC'], None,
+                        '; '.join(f"{field}: {_text(old_row[field])}" for field in fields),
+                        '; '.join(f"{field}: {_text(new_row[field])}" for field in fields)))
+    return changes
+
+@profiled(rows=len)
+def diff_catalogs(old_catalog, old_scripts, new_catalog, new_scripts):
+    """
+    Compare two snapshots of the V_CATALOG and scripts exports.
+
+    Columns are keyed by (schema, table, column) and scripts by DATA_SET_MNEMONIC. Keys and
+    fields are hashed column-wise, so only the changed rows are visited one by one.
+    Returns one row per added, removed or changed table, column and script.
+    """
+    changes = _diff_tables(old_catalog, new_catalog) + _diff_columns(old_catalog, new_catalog) + _diff_scripts(old_scripts, new_scripts)
+    return pd.DataFrame(changes, columns=CHANGE_COLUMNS)
+
+def summarize_changes(changes):
+    counts = changes.groupby(['kind', 'change'], sort=False).size()
+    lines = []
+    for kind in ('table', 'column', 'script'):
+        if kind in counts.index.get_level_values(0):
+            lines.append(f"{kind.capitalize()}s: " + ', '.join(f"{size} {change}" for change, size in counts[kind].items()))
+    return lines or ["No changes"]
+
+@profiled()
+def write_changes_workbook(changes, output_path, header_style, TABLE_STYLE, heading, engine='openpyxl'):
+    writer = WorkbookWriter(engine)
+    writer.add_named_style(header_style)
+    ws = writer.create_sheet(title=CHANGES_SHEET, key=CHANGES_SHEET)
+    ws.set_column_widths({'A': 10, 'B': 16, 'C': 30, 'D': 40, 'E': 30, 'F': 40, 'G': 40})
+    ws.hide_gridlines()
+
+    ws.append([styled(heading, style=header_style)])
+    for line in summarize_changes(changes):
+        ws.append([line])
+    ws.append([])
+
+    changes_table = ws.start_table("ChangesTable", CHANGE_HEADERS, TABLE_STYLE)
+    ws.append(CHANGE_HEADERS)
+    values = changes.astype(object)
+    ws.append_rows(values.where(values.notna(), None).itertuples(index=False, name=None))
+    if changes.empty:
+        # A table needs a row below its header
+        ws.append([])
+    ws.end_table(changes_table)
+    ws.close()
+
+    writer.save(output_path)
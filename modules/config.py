@@ -0,0 +1,41 @@
+import json
+
+# Keys every section of a batch config must provide
+SHARED_KEYS = ['v_catalog', 'all_scripts', 'tableau', 'output_folder', 'table_style', 'index_table_style', 'font_name']
+PROJECT_KEYS = ['name', 'tableau_workbook', 'excel_file_name', 'header_instructions', 'header_navigation', 'header_datasets', 'header_scripts', 'tableau_heading']
+
+def load_config(config_path):
+    with open(config_path, encoding='utf-8') as f:
+        config = json.load(f)
+
+    shared = config.get('shared', {})
+    missing = [key for key in SHARED_KEYS if key not in shared]
+    if missing:
+        raise ValueError(f"{config_path}: shared settings are missing {', '.join(missing)}")
+
+    projects = []
+    for position, project in enumerate(config.get('projects', []), start=1):
+        # Projects may override any shared setting, e.g. a different table style
+        project = {**shared, **project}
+        missing = [key for key in PROJECT_KEYS if key not in project]
+        # A project lists its tables and scripts exports, or the root datasets to trace them from
+        if 'roots' not in project:
+            missing += [key for key in ('tables', 'scripts') if key not in project]
+        if missing:
+            raise ValueError(f"{config_path}: project {project.get('name', position)} is missing {', '.join(missing)}")
+        projects.append(project)
+
+    names = [project['name'] for project in projects]
+    duplicates = sorted({name for name in names if names.count(name) > 1})
+    if duplicates:
+        raise ValueError(f"{config_path}: duplicate project names {', '.join(duplicates)}")
+
+    return shared, projects
+
+def select_projects(projects, names):
+    if not names:
+        return projects
+    unknown = set(names) - {project['name'] for project in projects}
+    if unknown:
+        raise ValueError(f"Unknown projects: {', '.join(sorted(unknown))}")
+    return [project for project in projects if project['name'] in names]
@@ -0,0 +1,61 @@
+import pandas as pd
+from modules.profiling import profiled
+from modules.tableau import FIELD_REFERENCE_PATTERN
+
+USED_BY_COLUMNS = ['table_schema', 'table_name', 'column_name', 'calculations', 'fields']
+COLUMN_KEY = ['table_schema', 'table_name', 'column_name']
+# Qualified references into these data sources are parameters, not columns
+NON_COLUMN_QUALIFIERS = {'parameters'}
+# Calculated fields named per column; the rest are counted
+MAX_LISTED_FIELDS = 10
+
+def field_references(tableau_fields):
+    # Every bracketed reference of every calculation, each calculation tokenized once
+    positions = []
+    keys = []
+    for position, calculation in enumerate(tableau_fields['Calculation'].tolist()):
+        if not isinstance(calculation, str):
+            continue
+        for qualifier, reference in FIELD_REFERENCE_PATTERN.findall(calculation):
+            if qualifier.lower() not in NON_COLUMN_QUALIFIERS:
+                positions.append(position)
+                keys.append(reference.lower())
+    fields = tableau_fields[['Workbook', 'Data Source', 'Field Name']].astype(object).iloc[positions]
+    return fields.assign(key=pd.Series(keys, index=fields.index, dtype=object)).reset_index(drop=True)
+
+def catalog_columns(tables):
+    # One row per column of the read_csv_schema tables
+    rows = [(table_info['schema'], table_name, column_name)
+            for table_name, table_info in tables.items() for ordinal_position, column_name, data_type in table_info['columns']]
+    return pd.DataFrame(rows, columns=COLUMN_KEY)
+
+def _field_list(field_names):
+    names = sorted(set(field_names))
+    listed = ', '.join(names[:MAX_LISTED_FIELDS])
+    return listed if len(names) <= MAX_LISTED_FIELDS else f"{listed} and {len(names) - MAX_LISTED_FIELDS} more"
+
+@profiled(rows=lambda result: len(result[0]))
+def build_cross_reference(tableau_fields, columns):
+    """
+    Match the field references of Tableau calculations against dataset column names.
+
+    Calculations are tokenized once and summarized per lower-case column name, then joined
+    to the columns on that name, so the result has at most one row per column however many
+    tables share a name. References to another calculated field of the same data source
+    are not column references.
+    Returns (used, unused): each used column with its calculation count and field names,
+    and the columns no calculation uses.
+    """
+    references = field_references(tableau_fields)
+
+    calculated = tableau_fields[['Workbook', 'Data Source']].astype(object).assign(key=tableau_fields['Field Name'].str.lower())
+    references = references.merge(calculated.drop_duplicates(), on=['Workbook', 'Data Source', 'key'], how='left', indicator=True)
+    references = references[references['_merge'] == 'left_only'].drop(columns='_merge')
+    references = references.drop_duplicates()
+
+    by_name = references.groupby('key', sort=False).agg(calculations=('Field Name', 'size'), fields=('Field Name', _field_list))
+
+    columns = columns[COLUMN_KEY].astype(object).assign(key=columns['column_name'].str.lower())
+    used = columns.merge(by_name, left_on='key', right_index=True)[USED_BY_COLUMNS].reset_index(drop=True)
+    unused = columns.loc[~columns['key'].isin(by_name.index), COLUMN_KEY].reset_index(drop=True)
+    return used, unused
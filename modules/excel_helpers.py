@@ -1,88 +1,145 @@
-from openpyxl import Workbook
+import copy
+import os
+from concurrent.futures import ProcessPoolExecutor
 from openpyxl.styles import Font, NamedStyle, Alignment
 from openpyxl.worksheet.table import Table, TableStyleInfo
-
-def truncate_table_name(table_name, existing_names):
-    truncated_name = table_name[:31]
-    if truncated_name in existing_names:
-        index = 1
-        while f"{truncated_name[:27]}_{index}" in existing_names:
-            index += 1
-        truncated_name = f"{truncated_name[:27]}_{index}"
-    return truncated_name
-
-def create_index_sheet(wb, table_names, scripts, tableau_fields, header_style, INDEX_TABLE_STYLE, HEADER_INSTRUCTIONS, HEADER_NAVIGATION, HEADER_DATASETS, HEADER_SCRIPTS, TABLEAU_HEADING):
-    index_sheet = wb.create_sheet(title="Index", index=0)
-    index_sheet.column_dimensions['A'].width = 40
-    index_sheet.column_dimensions['B'].width = 40
-    index_sheet.column_dimensions['C'].width = 40
-    index_sheet.column_dimensions['D'].width = 15
-    index_sheet.column_dimensions['E'].width = 15
-    index_sheet.sheet_view.showGridLines = False
-
-    index_sheet.append(["Instructions"])
-    index_sheet["A1"].style = header_style
+from modules.cross_reference import build_cross_reference, catalog_columns
+from modules.manifest import EXPORT_VERSION, content_digest, sheet_key, same_sheet, load_manifest, write_manifest, compare_manifests, print_report
+from modules.names import sheet_hyperlink, sheet_location
+from modules.profiling import profiled
+from modules.writers import WorkbookWriter, styled
+
+# SQL layouts: one line per row in a monospace font, or the legacy merged block
+SQL_LAYOUTS = ('lines', 'merged')
+SQL_FONT = Font(name='Consolas', size=10)
+SQL_CHUNK_SIZE = 1000  # Longer SQL lines are split across rows of this many characters
+INDEX_SHEET = "Index"  # Reserved before any other sheet is named, so back links can rely on it
+USED_BY_SHEET = "Used By"
+
+@profiled()
+def build_catalog_index(additional_v_catalog, all_scripts):
+    # Walk the full catalog and scripts exports once so sheet builders can look up by name
+    scripts_by_mnemonic = {}
+    first_scripts = all_scripts.drop_duplicates(subset='DATA_SET_MNEMONIC', keep='first')
+    for record in first_scripts.to_dict('records'):
+        scripts_by_mnemonic[record['DATA_SET_MNEMONIC']] = record
+
+    columns_by_table = {}
+    catalog = additional_v_catalog[['table_name', 'ordinal_position', 'column_name', 'data_type']]
+    for table_name, group in catalog.groupby('table_name', sort=False, observed=True):
+        columns_by_table[table_name] = list(zip(group['ordinal_position'].tolist(), group['column_name'].tolist(), group['data_type'].tolist()))
+
+    return {'scripts': scripts_by_mnemonic, 'columns': columns_by_table}
+
+def split_sql_lines(sql):
+    if not isinstance(sql, str):
+        return []
+    rows = []
+    for line in sql.expandtabs(4).splitlines():
+        line = line.rstrip()
+        if not line:
+            rows.append('')
+            continue
+        for start in range(0, len(line), SQL_CHUNK_SIZE):
+            rows.append(line[start:start + SQL_CHUNK_SIZE])
+    return rows
+
+def sql_cells(sql, sql_layout):
+    if sql_layout == 'merged':
+        return [styled(sql, alignment=Alignment(wrap_text=True, vertical='top', horizontal='left'))]
+    # One row per SQL line, so the sheet grows with the script instead of a fixed merged block.
+    # Lines such as "= b.id" must stay text rather than become formulas.
+    return [styled(line, font=SQL_FONT, as_text=True) if line else None for line in split_sql_lines(sql)]
+
+def dataframe_rows(df, columns):
+    # Plain row tuples for the writer, with missing values as empty cells
+    values = df[columns].astype(object)
+    return values.where(values.notna(), None).itertuples(index=False, name=None)
+
+def hyperlink_cell(sheet_name, workbook_file=None):
+    # A sheet of a sharded catalog is linked in the workbook file that holds it
+    hyperlink = (workbook_file, sheet_location(sheet_name)) if workbook_file else sheet_hyperlink(sheet_name)
+    return styled(sheet_name, style="Hyperlink", hyperlink=hyperlink)
+
+def back_to_index_cell(index_file=None):
+    hyperlink = (index_file, sheet_location(INDEX_SHEET)) if index_file else sheet_hyperlink(INDEX_SHEET)
+    return styled("Back to Index", style="Hyperlink", hyperlink=hyperlink)
+
+@profiled()
+def create_index_sheet(writer, table_names, scripts, tableau_fields, header_style, INDEX_TABLE_STYLE, HEADER_INSTRUCTIONS, HEADER_NAVIGATION, HEADER_DATASETS, HEADER_SCRIPTS, TABLEAU_HEADING, sheet_files=None):
+    sheet_files = sheet_files or {}
+    index_sheet = writer.create_sheet(title=INDEX_SHEET, index=0, key=INDEX_SHEET)
+    index_sheet.set_column_widths({'A': 40, 'B': 40, 'C': 40, 'D': 15, 'E': 15})
+    index_sheet.hide_gridlines()
+
+    index_sheet.append([styled("Instructions", style=header_style)])
     index_sheet.append([HEADER_INSTRUCTIONS])
     index_sheet.append([HEADER_NAVIGATION])
     index_sheet.append([])
 
-    index_sheet.append([HEADER_DATASETS])
-    index_sheet["A5"].style = header_style
+    index_sheet.append([styled(HEADER_DATASETS, style=header_style)])
+    datasets_table = index_sheet.start_table("DatasetsTable", ["Schema", "Table Name", "Sheet Name"], INDEX_TABLE_STYLE)
     index_sheet.append(["Schema", "Table Name", "Sheet Name"])
-
-    for table_name, table_info in table_names.items():
-        schema = table_info['schema']
-        sheet_name = table_info['sheet_name']
-        row_idx = index_sheet.max_row + 1
-        index_sheet.cell(row=row_idx, column=1, value=schema)
-        index_sheet.cell(row=row_idx, column=2, value=table_name)
-        cell = index_sheet.cell(row=row_idx, column=3, value=sheet_name)
-        cell.hyperlink = f"#{sheet_name}!A1"
-        cell.style = "Hyperlink"
-
-    max_row = index_sheet.max_row
-    table = Table(displayName="DatasetsTable", ref=f"A6:C{max_row}")
-    style = TableStyleInfo(name=INDEX_TABLE_STYLE, showFirstColumn=False, showLastColumn=False, showRowStripes=True, showColumnStripes=False)
-    table.tableStyleInfo = style
-    index_sheet.add_table(table)
+    index_sheet.append_rows(
+        (table_info['schema'], table_name, hyperlink_cell(table_info['sheet_name'], sheet_files.get(('dataset', table_name))))
+        for table_name, table_info in table_names.items()
+    )
+    index_sheet.end_table(datasets_table)
 
     index_sheet.append([])
 
-    index_sheet.append([HEADER_SCRIPTS])
-    scripts_header_row = index_sheet.max_row
-    index_sheet[f"A{scripts_header_row}"].style = header_style
-    index_sheet.append(["Workflow Name", "Dataset Mnemonic", "Dataset Version", "Date Modified", "Sheet Name"])
-
-    for i, script in scripts.iterrows():
-        sheet_name = f"Script_{i + 1}"
-        row_idx = index_sheet.max_row + 1
-        index_sheet.append([script["WORKFLOW_NAME"], script["DATA_SET_MNEMONIC"], script["DATA_SET_VERSION"], script["DATE_MODIFIED"], sheet_name])
-        cell = index_sheet.cell(row=row_idx, column=5)
-        cell.hyperlink = f"#{sheet_name}!A1"
-        cell.style = "Hyperlink"
-
-    max_row = index_sheet.max_row
-    table = Table(displayName="ScriptsTable", ref=f"A{scripts_header_row + 1}:E{max_row}")
-    style = TableStyleInfo(name=INDEX_TABLE_STYLE, showFirstColumn=False, showLastColumn=False, showRowStripes=True, showColumnStripes=False)
-    table.tableStyleInfo = style
-    index_sheet.add_table(table)
+    index_sheet.append([styled(HEADER_SCRIPTS, style=header_style)])
+    scripts_headers = ["Workflow Name", "Dataset Mnemonic", "Dataset Version", "Date Modified", "Sheet Name"]
+    scripts_table = index_sheet.start_table("ScriptsTable", scripts_headers, INDEX_TABLE_STYLE)
+    index_sheet.append(scripts_headers)
+    script_rows = dataframe_rows(scripts, ["WORKFLOW_NAME", "DATA_SET_MNEMONIC", "DATA_SET_VERSION", "DATE_MODIFIED"])
+    sheet_links = (hyperlink_cell(writer.names.sheets[('script', i)], sheet_files.get(('script', i))) for i in scripts.index)
+    index_sheet.append_rows(row + (link,) for row, link in zip(script_rows, sheet_links))
+    index_sheet.end_table(scripts_table)
 
     index_sheet.append([])
 
-    index_sheet.append([TABLEAU_HEADING])
-    tableau_header_row = index_sheet.max_row
-    index_sheet[f"A{tableau_header_row}"].style = header_style
-    index_sheet.append(["Data Source", "Field Name", "Calculation", "Data Type"])
+    index_sheet.append([styled(TABLEAU_HEADING, style=header_style)])
+    tableau_headers = ["Data Source", "Field Name", "Calculation", "Data Type"]
+    tableau_table = index_sheet.start_table("TableauFieldsTable", tableau_headers, INDEX_TABLE_STYLE)
+    index_sheet.append(tableau_headers)
+    index_sheet.append_rows(dataframe_rows(tableau_fields, tableau_headers))
+    index_sheet.end_table(tableau_table)
 
-    for _, row in tableau_fields.iterrows():
-        row_idx = index_sheet.max_row + 1
-        index_sheet.append([row["Data Source"], row["Field Name"], row["Calculation"], row["Data Type"]])
+    index_sheet.close()
 
-    max_row = index_sheet.max_row
-    table = Table(displayName="TableauFieldsTable", ref=f"A{tableau_header_row + 1}:D{max_row}")
-    style = TableStyleInfo(name=INDEX_TABLE_STYLE, showFirstColumn=False, showLastColumn=False, showRowStripes=True, showColumnStripes=False)
-    table.tableStyleInfo = style
-    index_sheet.add_table(table)
+@profiled()
+def add_used_by_sheet(writer, tables, tableau_fields, header_style, INDEX_TABLE_STYLE):
+    used, unused = build_cross_reference(tableau_fields, catalog_columns(tables))
+    ws = writer.create_sheet(title=USED_BY_SHEET, index=2, key=USED_BY_SHEET)
+    ws.set_column_widths({'A': 30, 'B': 40, 'C': 30, 'D': 15, 'E': 80})
+    ws.hide_gridlines()
+
+    ws.append([styled("Used By", style=header_style), None, None, None, back_to_index_cell()])
+    ws.append(["Dataset columns referenced by the Tableau calculated fields, matched on the column name."])
+    ws.append([])
+
+    ws.append([styled("Columns used by calculated fields", style=header_style)])
+    used_headers = ["Schema", "Table Name", "Column Name", "Calculations", "Calculated Fields"]
+    used_table = ws.start_table("UsedByTable", used_headers, INDEX_TABLE_STYLE)
+    ws.append(used_headers)
+    ws.append_rows(dataframe_rows(used, ['table_schema', 'table_name', 'column_name', 'calculations', 'fields']))
+    if used.empty:
+        ws.append([])
+    ws.end_table(used_table)
+
+    ws.append([])
+
+    ws.append([styled("Columns not used by any calculated field", style=header_style)])
+    unused_headers = ["Schema", "Table Name", "Column Name"]
+    unused_table = ws.start_table("UnusedColumnsTable", unused_headers, INDEX_TABLE_STYLE)
+    ws.append(unused_headers)
+    ws.append_rows(dataframe_rows(unused, ['table_schema', 'table_name', 'column_name']))
+    if unused.empty:
+        ws.append([])
+    ws.end_table(unused_table)
+
+    ws.close()
 
 def format_worksheet(ws, table_name, table_schema, header_style, TABLE_STYLE):
     ws.column_dimensions['A'].width = 4
@@ -100,81 +157,65 @@ def format_worksheet(ws, table_name, table_schema, header_style, TABLE_STYLE):
     table.tableStyleInfo = style
     ws.add_table(table)
 
-def add_table_to_sheet(wb, table_name, table_info, all_scripts, header_style, TABLE_STYLE):
+def side_by_side(left_rows, right_rows, right_column):
+    # Rows holding two independent blocks, the right block starting at right_column
+    for i in range(max(len(left_rows), len(right_rows))):
+        left = list(left_rows[i]) if i < len(left_rows) else []
+        right = list(right_rows[i]) if i < len(right_rows) else []
+        if right:
+            left += [None] * (right_column - 1 - len(left))
+        yield left + right
+
+@profiled()
+def add_table_to_sheet(writer, table_name, table_info, catalog_index, header_style, TABLE_STYLE, sql_layout='lines', index_file=None):
     table_schema = table_info['schema']
-    truncated_name = truncate_table_name(table_name.upper(), wb.sheetnames)
+    ws = writer.create_sheet(title=table_name.upper(), key=('dataset', table_name))
+
+    # Adjust column widths
+    ws.set_column_widths({'B': 30, 'C': 30, 'E': 30, 'F': 30, 'G': 30, 'H': 30, 'I': 30})
 
-    ws = wb.create_sheet(title=truncated_name)
-    ws.append([table_name.upper()])
+    # Set the back to index hyperlink and the SQL_TRANSFORMATION title
+    ws.append([table_name.upper(), None, None, None, back_to_index_cell(index_file)])
     ws.append([f"Schema: {table_schema}"])
-    ws.append([])
-    ws.append(["#", "Column Name", "Data Type"])
+    ws.append([None, None, None, None, styled("SQL_TRANSFORMATION", style=header_style)])
 
+    # The column table (A to C) and the SQL transformation query (E) share the rows from row 4 down
+    headers = ["#", "Column Name", "Data Type"]
     sorted_columns = sorted(table_info['columns'], key=lambda x: x[0])
-    for ordinal_position, column_name, data_type in sorted_columns:
-        ws.append([str(ordinal_position), column_name, data_type])
+    column_rows = [headers] + [(str(ordinal_position), column_name, data_type) for ordinal_position, column_name, data_type in sorted_columns]
 
-    # Calculate the end row for the table based on actual data
-    table_end_row = len(sorted_columns) + 4
-
-    # Ensure the table name is unique within the sheet
-    base_table_name = f"{truncated_name}_table"
-    unique_table_name = base_table_name
-    count = 1
-    while unique_table_name in [t.name for t in ws._tables]:
-        unique_table_name = f"{base_table_name}_{count}"
-        count += 1
-
-    # Add the table style
-    table = Table(displayName=unique_table_name, ref=f"A4:C{table_end_row}")
-    style = TableStyleInfo(name=TABLE_STYLE, showFirstColumn=False, showLastColumn=False, showRowStripes=True, showColumnStripes=False)
-    table.tableStyleInfo = style
-    ws.add_table(table)
+    matching_script = catalog_index['scripts'].get(table_name)
+    sql_rows = [[cell] for cell in sql_cells(matching_script['TRANSFORMATION_SQL'], sql_layout)] if matching_script is not None else []
 
-    # Add the SQL_TRANSFORMATION title
-    sql_title_row = 3
-    sql_content_start_row = 4
-    sql_content_end_row = sql_content_start_row + 499
-    ws.cell(row=sql_title_row, column=5, value="SQL_TRANSFORMATION").style = header_style
+    # Calculate the end row for the table based on actual data
+    table_end_row = ws.row + len(column_rows)
+    # The table name is made unique across the whole workbook by the writer
+    table_display_name = ws.start_table(f"{ws.title}_table", headers, TABLE_STYLE)
+    ws.append_rows(side_by_side(column_rows, sql_rows, 5))
+    ws.end_table(table_display_name, end_row=table_end_row)
 
     # Merge cells for SQL_TRANSFORMATION to span 500 rows and columns E to I
-    ws.merge_cells(start_row=sql_content_start_row, start_column=5, end_row=sql_content_end_row, end_column=9)
+    if sql_layout == 'merged':
+        ws.merge_cells(start_row=4, start_column=5, end_row=503, end_column=9)
 
-    # Add the SQL transformation query
-    matching_script = all_scripts[all_scripts['DATA_SET_MNEMONIC'] == table_name]
-    if not matching_script.empty:
-        sql_cell = ws.cell(row=sql_content_start_row, column=5, value=matching_script.iloc[0]['TRANSFORMATION_SQL'])
-        sql_cell.alignment = Alignment(wrap_text=True, vertical='top', horizontal='left')
-
-    # Set the back to index hyperlink
-    cell = ws.cell(row=1, column=5, value="Back to Index")
-    cell.hyperlink = "#Index!A1"
-    cell.style = "Hyperlink"
-
-    # Adjust column widths
-    ws.column_dimensions['B'].width = 30
-    ws.column_dimensions['C'].width = 30
-    ws.column_dimensions['E'].width = 30
-    ws.column_dimensions['F'].width = 30
-    ws.column_dimensions['G'].width = 30
-    ws.column_dimensions['H'].width = 30
-    ws.column_dimensions['I'].width = 30
+    ws.close()
 
     # Format the worksheet table (only if needed, otherwise skip this step)
-    # format_worksheet(ws, truncated_name, table_schema, header_style, TABLE_STYLE)
+    # format_worksheet(ws, ws.title, table_schema, header_style, TABLE_STYLE)
 
-def add_script_to_sheet(wb, script, index, additional_v_catalog, header_style, TABLE_STYLE):
+    return ws.title
+
+@profiled()
+def add_script_to_sheet(writer, script, index, catalog_index, header_style, TABLE_STYLE, sql_layout='lines', index_file=None):
     sheet_name = f"Script_{index + 1}"
     dataset_mnemonic = script["DATA_SET_MNEMONIC"]
     title = f"{dataset_mnemonic} Script"
 
-    ws = wb.create_sheet(title=sheet_name)
-    ws.column_dimensions['A'].width = 20
-    ws.column_dimensions['B'].width = 20
-    ws.sheet_view.showGridLines = False
+    ws = writer.create_sheet(title=sheet_name, key=('script', index))
+    ws.set_column_widths({'A': 20, 'B': 20, 'N': 15, 'O': 15, 'P': 15})
+    ws.hide_gridlines()
 
-    ws.append([title])
-    ws["A1"].style = header_style
+    ws.append([styled(title, style=header_style), None, None, None, back_to_index_cell(index_file)])
     ws.append([])
 
     ws.append(["WORKFLOW_NAME", script["WORKFLOW_NAME"]])
@@ -182,51 +223,36 @@ def add_script_to_sheet(wb, script, index, additional_v_catalog, header_style, T
     ws.append(["DATA_SET_VERSION", str(script["DATA_SET_VERSION"])])
     ws.append(["DATE_MODIFIED", script["DATE_MODIFIED"]])
     ws.append([])
-    ws.append(["TRANSFORMATION_SQL"])
-    ws["A8"].style = header_style
-
-    start_row = ws.max_row + 1
-    end_row = start_row + 500
-    ws.merge_cells(start_row=start_row, start_column=1, end_row=end_row, end_column=12)
-    sql_cell = ws.cell(row=start_row, column=1, value=script["TRANSFORMATION_SQL"])
-    sql_cell.alignment = Alignment(wrap_text=True, vertical='top', horizontal='left')
-    sql_cell.font = Font(name='Calibri', size=11)
-
-    ws.column_dimensions['N'].width = 15
-    ws.column_dimensions['O'].width = 15
-    ws.column_dimensions['P'].width = 15
-
-    table_start_row = 8
-    table_title_row = table_start_row
-    ws.cell(row=table_title_row, column=14, value="Table Columns").style = header_style
-    table_start_row += 1
-    ws.cell(row=table_start_row, column=14, value="#")
-    ws.cell(row=table_start_row, column=15, value="Column Name")
-    ws.cell(row=table_start_row, column=16, value="Data Type")
-
-    matching_catalog = additional_v_catalog[(additional_v_catalog['table_name'] == dataset_mnemonic)]
-    for _, row in matching_catalog.iterrows():
-        table_start_row += 1
-        ws.cell(row=table_start_row, column=14, value=row["ordinal_position"])
-        ws.cell(row=table_start_row, column=15, value=row["column_name"])
-        ws.cell(row=table_start_row, column=16, value=row["data_type"])
-
-    table_end_row = table_start_row
-    table = Table(displayName=f"{dataset_mnemonic}_Columns", ref=f"N{table_title_row + 1}:P{table_end_row}")
-    style = TableStyleInfo(name=TABLE_STYLE, showFirstColumn=False, showLastColumn=False, showRowStripes=True, showColumnStripes=False)
-    table.tableStyleInfo = style
-    ws.add_table(table)
 
-    cell = ws.cell(row=1, column=5, value="Back to Index")
-    cell.hyperlink = "#Index!A1"
-    cell.style = "Hyperlink"
+    # The SQL (column A) and the table columns (N to P) share the rows from row 8 down
+    ws.append([styled("TRANSFORMATION_SQL", style=header_style)] + [None] * 12 + [styled("Table Columns", style=header_style)])
+
+    sql_rows = [[cell] for cell in sql_cells(script["TRANSFORMATION_SQL"], sql_layout)]
+    if sql_layout == 'merged':
+        sql_rows[0][0] = sql_rows[0][0]._replace(font=Font(name='Calibri', size=11))
+
+    headers = ["#", "Column Name", "Data Type"]
+    column_rows = [headers] + catalog_index['columns'].get(dataset_mnemonic, [])
+    # Scripts of the same dataset would share this name, the writer numbers the repeats
+    table_end_row = ws.row + len(column_rows)
+    table_name = ws.start_table(f"{dataset_mnemonic}_Columns", headers, TABLE_STYLE, first_column=14)
+    ws.append_rows(side_by_side(sql_rows, column_rows, 14))
+    ws.end_table(table_name, end_row=table_end_row)
 
-def add_refresh_instructions(wb, header_style):
+    if sql_layout == 'merged':
+        ws.merge_cells(start_row=9, start_column=1, end_row=509, end_column=12)
+
+    ws.close()
+
+    return ws.title
+
+@profiled()
+def add_refresh_instructions(writer, header_style):
     # Create a new sheet for refresh instructions and make it the second sheet
-    instructions_sheet = wb.create_sheet(title="Refresh Instructions", index=1)
+    instructions_sheet = writer.create_sheet(title="Refresh Instructions", index=1, key="Refresh Instructions")
     
     # Remove gridlines
-    instructions_sheet.sheet_view.showGridLines = False
+    instructions_sheet.hide_gridlines()
 
     # Write the instructions
     instructions = [
@@ -259,7 +285,7 @@ def add_refresh_instructions(wb, header_style):
         ("", None),
         
         ("5. Adding Tableau Workbooks:", "Bold"),
-        ("   - Add Tableau workbooks in .TWB format to the 'input/tableau' subfolder.", None),
+        ("   - Add Tableau workbooks in .TWB or packaged .TWBX format to the 'input/tableau' subfolder.", None),
         ("   - Run 'extract_tableau_calculations.py' to create 'tableau.csv' in the 'output' folder.", None),
         ("", None),
         
@@ -271,37 +297,225 @@ def add_refresh_instructions(wb, header_style):
         ("If you encounter any issues, please refer to the repository README.", None),
     ]
 
-    for row_num, (text, style) in enumerate(instructions, start=1):
-        cell = instructions_sheet.cell(row=row_num, column=1, value=text)
+    for text, style in instructions:
         if style == "Bold":
-            cell.font = Font(bold=True)
+            cell = styled(text, font=Font(bold=True))
         elif style == "Hyperlink":
-            cell.hyperlink = "https://github.com/EddieDavison92/hei-dataset-and-queries-exporter"
-            cell.style = "Hyperlink"
+            cell = styled(text, style="Hyperlink", hyperlink="https://github.com/EddieDavison92/hei-dataset-and-queries-exporter")
         elif style:
-            cell.style = style
+            cell = styled(text, style=style)
+        else:
+            cell = text
+        instructions_sheet.append([cell])
+
+    instructions_sheet.close()
+
+def estimate_sheet_cells(columns, sql):
+    # Rough cell count of a dataset or script sheet: the column table, the SQL rows and the header block
+    sql_rows = sql.count('\n') + 1 if isinstance(sql, str) else 0
+    return 3 * (len(columns) + 1) + sql_rows + 10
+
+def shard_file_name(output_path, number):
+    stem, extension = os.path.splitext(os.path.basename(output_path))
+    return f"{stem}_{number:02d}{extension}"
+
+def shard_number(shard_file):
+    return int(os.path.splitext(shard_file)[0].rsplit('_', 1)[1])
+
+def assign_shards(sheet_sizes, output_path, max_sheets=None, max_cells=None, previous_files=None):
+    # Sheets keep the shard they were written to before, so unchanged shards can be kept as they are.
+    # Other sheets are packed in order into the last shard and then new ones within the budget;
+    # an oversized sheet gets a shard of its own.
+    previous_files = previous_files or {}
+    assigned = {}
+    loads = {}
+    new_sheets = []
+    for key, cells in sheet_sizes:
+        shard_file = previous_files.get(key)
+        if shard_file is None:
+            new_sheets.append((key, cells))
+            continue
+        assigned[key] = shard_file
+        load = loads.setdefault(shard_file, [0, 0])
+        load[0] += 1
+        load[1] += cells
+
+    number = max(map(shard_number, loads), default=1)
+    sheets, shard_cells = loads.get(shard_file_name(output_path, number), [0, 0])
+    for key, cells in new_sheets:
+        full = (max_sheets and sheets >= max_sheets) or (max_cells and shard_cells + cells > max_cells)
+        if sheets and full:
+            number += 1
+            sheets = shard_cells = 0
+        assigned[key] = shard_file_name(output_path, number)
+        sheets += 1
+        shard_cells += cells
+
+    # Within each shard the sheets follow the index order
+    return {key: assigned[key] for key, cells in sheet_sizes}
+
+@profiled()
+def render_shard(shard_path, tables, scripts, sheet_names, catalog_index, header_style, TABLE_STYLE, sql_layout, engine, index_file):
+    # May run in a worker process; the shard's sheet names were allocated by the index workbook beforehand
+    header_style = copy.deepcopy(header_style)
+    writer = WorkbookWriter(engine)
+    writer.add_named_style(header_style)
+    for key, sheet_name in sheet_names:
+        writer.names.sheet_name(sheet_name, key)
 
-def export_to_excel(tables, scripts, tableau_fields, additional_v_catalog, all_scripts, output_path, header_style, INDEX_TABLE_STYLE, TABLE_STYLE, HEADER_INSTRUCTIONS, HEADER_NAVIGATION, HEADER_DATASETS, HEADER_SCRIPTS, TABLEAU_HEADING):
-    wb = Workbook()
-    wb.remove(wb.active)
-
-    if "header_style" not in wb.named_styles:
-        wb.add_named_style(header_style)
+    for table_name, table_info in tables.items():
+        add_table_to_sheet(writer, table_name, table_info, catalog_index, header_style, TABLE_STYLE, sql_layout, index_file)
+    for i, script in scripts:
+        add_script_to_sheet(writer, script, i, catalog_index, header_style, TABLE_STYLE, sql_layout, index_file)
+
+    writer.save(shard_path)
+    return shard_path
+
+def export_shards(writer, shard_files, render_files, tables, script_records, catalog_index, output_path, header_style, TABLE_STYLE, sql_layout, engine, workers):
+    output_folder = os.path.dirname(output_path)
+    index_file = os.path.basename(output_path)
+    keys_by_file = {}
+    for key, shard_file in shard_files.items():
+        keys_by_file.setdefault(shard_file, []).append(key)
+
+    jobs = []
+    for shard_file in sorted(render_files, key=shard_number):
+        keys = keys_by_file[shard_file]
+        shard_tables = {name: tables[name] for kind, name in keys if kind == 'dataset'}
+        shard_scripts = [(i, script_records[i]) for kind, i in keys if kind == 'script']
+
+        # Each worker gets only the slice of the catalog index its sheets look up
+        shard_index = {
+            'scripts': {name: catalog_index['scripts'][name] for name in shard_tables if name in catalog_index['scripts']},
+            'columns': {script['DATA_SET_MNEMONIC']: catalog_index['columns'].get(script['DATA_SET_MNEMONIC'], []) for i, script in shard_scripts},
+        }
+        sheet_names = [(key, writer.names.sheets[key]) for key in keys]
+        jobs.append((os.path.join(output_folder, shard_file), shard_tables, shard_scripts, sheet_names, shard_index, header_style, TABLE_STYLE, sql_layout, engine, index_file))
+
+    if workers == 1 or len(jobs) <= 1:
+        for job in jobs:
+            render_shard(*job)
+    else:
+        # Shards are independent workbooks, so they are rendered and saved in parallel
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for future in [pool.submit(render_shard, *job) for job in jobs]:
+                future.result()
+
+@profiled()
+def export_to_excel(tables, scripts, tableau_fields, additional_v_catalog, all_scripts, output_path, header_style, INDEX_TABLE_STYLE, TABLE_STYLE, HEADER_INSTRUCTIONS, HEADER_NAVIGATION, HEADER_DATASETS, HEADER_SCRIPTS, TABLEAU_HEADING, catalog_index=None, sql_layout='lines', engine='openpyxl', max_sheets=None, max_cells=None, workers=None, incremental=False, used_by=False):
+    if sql_layout not in SQL_LAYOUTS:
+        raise ValueError(f"Unknown SQL layout '{sql_layout}', expected one of {', '.join(SQL_LAYOUTS)}")
+    if sql_layout == 'merged' and engine == 'stream':
+        raise ValueError("The merged SQL layout needs the openpyxl engine, the streaming engine cannot merge cells")
+
+    # Index the full catalog and scripts once for every sheet builder (batches pass a shared index)
+    if catalog_index is None:
+        catalog_index = build_catalog_index(additional_v_catalog, all_scripts)
+
+    # Shards get their own copy of the header style, taken before the index workbook binds it
+    shard_header_style = copy.deepcopy(header_style)
+    writer = WorkbookWriter(engine)
+    writer.add_named_style(header_style)
+
+    # Reserve the index and Used By sheet names first, so no dataset sheet can take them
+    writer.names.sheet_name(INDEX_SHEET, key=INDEX_SHEET)
+    if used_by:
+        writer.names.sheet_name(USED_BY_SHEET, key=USED_BY_SHEET)
 
     # Add refresh instructions
-    add_refresh_instructions(wb, header_style)
+    add_refresh_instructions(writer, header_style)
 
+    # Every sheet is named up front in index order, and its inputs are hashed for the manifest
     table_names = {}
+    entries = {}
+    sheet_cells = {}
     for table_name, table_info in tables.items():
-        table_names[table_name] = {
-            'schema': table_info['schema'],
-            'sheet_name': truncate_table_name(table_name.upper(), wb.sheetnames)
-        }
-        add_table_to_sheet(wb, table_name, table_info, all_scripts, header_style, TABLE_STYLE)
-
-    for i, script in scripts.iterrows():
-        add_script_to_sheet(wb, script, i, additional_v_catalog, header_style, TABLE_STYLE)
-
-    create_index_sheet(wb, table_names, scripts, tableau_fields, header_style, INDEX_TABLE_STYLE, HEADER_INSTRUCTIONS, HEADER_NAVIGATION, HEADER_DATASETS, HEADER_SCRIPTS, TABLEAU_HEADING)
-
-    wb.save(output_path)
+        sheet_name = writer.names.sheet_name(table_name.upper(), key=('dataset', table_name))
+        table_names[table_name] = {'schema': table_info['schema'], 'sheet_name': sheet_name}
+        sql = catalog_index['scripts'].get(table_name, {}).get('TRANSFORMATION_SQL')
+        entries[('dataset', table_name)] = {'kind': 'dataset', 'label': table_name, 'sheet': sheet_name, 'file': None,
+                                            'digest': content_digest(table_info['schema'], table_info['columns'], sql)}
+        sheet_cells[('dataset', table_name)] = estimate_sheet_cells(table_info['columns'], sql)
+
+    script_records = dict(zip(scripts.index, scripts.to_dict('records')))
+    for i, script in script_records.items():
+        sheet_name = writer.names.sheet_name(f"Script_{i + 1}", key=('script', i))
+        columns = catalog_index['columns'].get(script['DATA_SET_MNEMONIC'], [])
+        entries[('script', i)] = {'kind': 'script', 'label': script['DATA_SET_MNEMONIC'], 'sheet': sheet_name, 'file': None,
+                                  'digest': content_digest(script, columns)}
+        sheet_cells[('script', i)] = estimate_sheet_cells(columns, script['TRANSFORMATION_SQL'])
+
+    keys = {}
+    taken = set()
+    for key, entry in entries.items():
+        keys[key] = sheet_key(entry['kind'], entry['label'], taken)
+        taken.add(keys[key])
+    manifest = {
+        'version': EXPORT_VERSION,
+        'settings': content_digest(EXPORT_VERSION, sql_layout, engine, TABLE_STYLE, INDEX_TABLE_STYLE, header_style.name, repr(header_style.font), max_sheets, max_cells, used_by),
+        'index': content_digest(HEADER_INSTRUCTIONS, HEADER_NAVIGATION, HEADER_DATASETS, HEADER_SCRIPTS, TABLEAU_HEADING, table_names,
+                                list(dataframe_rows(scripts, ["WORKFLOW_NAME", "DATA_SET_MNEMONIC", "DATA_SET_VERSION", "DATE_MODIFIED"])),
+                                list(dataframe_rows(tableau_fields, ["Data Source", "Field Name", "Calculation", "Data Type"]))),
+        'sheets': {keys[key]: entry for key, entry in entries.items()},
+    }
+    previous = load_manifest(output_path)
+    report = compare_manifests(previous, manifest)
+    output_folder = os.path.dirname(output_path)
+    previous_sheets = previous['sheets'] if previous else {}
+    previous_files = {entry['file'] for entry in previous_sheets.values() if entry.get('file')}
+
+    # The previous output can only be reused if it was written with the same settings and is still on disk
+    reusable = (incremental and previous is not None and previous.get('settings') == manifest['settings']
+                and os.path.exists(output_path) and all(os.path.exists(os.path.join(output_folder, shard_file)) for shard_file in previous_files))
+    if (reusable and previous.get('index') == manifest['index'] and previous_sheets.keys() == manifest['sheets'].keys()
+            and all(same_sheet(previous_sheets[key], entry, ('digest', 'sheet')) for key, entry in manifest['sheets'].items())):
+        if incremental:
+            print_report(report, [])
+        return report
+
+    # With a size budget, datasets and scripts are split across workbooks
+    shard_files = None
+    if max_sheets or max_cells:
+        kept_files = {key: previous_sheets[keys[key]].get('file') for key in entries if keys[key] in previous_sheets} if reusable else {}
+        kept_files = {key: shard_file for key, shard_file in kept_files.items() if shard_file}
+        shard_files = assign_shards(list(sheet_cells.items()), output_path, max_sheets, max_cells, kept_files)
+        if len(set(shard_files.values())) == 1 and not kept_files:
+            shard_files = None
+
+    if shard_files is None:
+        for table_name, table_info in tables.items():
+            add_table_to_sheet(writer, table_name, table_info, catalog_index, header_style, TABLE_STYLE, sql_layout)
+        for i, script in script_records.items():
+            add_script_to_sheet(writer, script, i, catalog_index, header_style, TABLE_STYLE, sql_layout)
+        rendered = []
+    else:
+        # A shard is rewritten when one of its sheets was added, changed or renamed, or a sheet left it
+        render_files = set()
+        for key, shard_file in shard_files.items():
+            entries[key]['file'] = shard_file
+            if not (reusable and same_sheet(previous_sheets.get(keys[key]), entries[key])):
+                render_files.add(shard_file)
+        if reusable:
+            for key, old_entry in previous_sheets.items():
+                if old_entry.get('file') in shard_files.values() and manifest['sheets'].get(key, {}).get('file') != old_entry['file']:
+                    render_files.add(old_entry['file'])
+
+        export_shards(writer, shard_files, render_files, tables, script_records, catalog_index, output_path, shard_header_style, TABLE_STYLE, sql_layout, engine, workers)
+        rendered = sorted(render_files, key=shard_number)
+
+    create_index_sheet(writer, table_names, scripts, tableau_fields, header_style, INDEX_TABLE_STYLE, HEADER_INSTRUCTIONS, HEADER_NAVIGATION, HEADER_DATASETS, HEADER_SCRIPTS, TABLEAU_HEADING, shard_files)
+    if used_by:
+        add_used_by_sheet(writer, tables, tableau_fields, header_style, INDEX_TABLE_STYLE)
+
+    writer.save(output_path)
+
+    # Shards of the previous run that no sheet uses any more are removed
+    current_files = set(shard_files.values()) if shard_files else set()
+    for shard_file in previous_files - current_files:
+        if os.path.exists(os.path.join(output_folder, shard_file)):
+            os.remove(os.path.join(output_folder, shard_file))
+    write_manifest(output_path, manifest)
+
+    if incremental:
+        print_report(report, [os.path.basename(output_path)] + rendered)
+    return report
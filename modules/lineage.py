@@ -0,0 +1,133 @@
+import argparse
+import re
+from modules.profiling import profiled
+from modules.readers import V_CATALOG_DTYPES, read_additional_v_catalog, read_all_scripts, schema_from_catalog
+
+# Comments and string literals are removed before looking for table references
+COMMENT_PATTERN = re.compile(r"--[^\n]*|/\*.*?\*/", re.S)
+STRING_PATTERN = re.compile(r"'(?:[^']|'')*'")
+# A table reference: up to three dotted parts, each a plain or double-quoted identifier
+IDENTIFIER = r'(?:"[^"]+"|\w+)'
+QUALIFIED_NAME = rf'{IDENTIFIER}(?:\s*\.\s*{IDENTIFIER}){{0,2}}'
+FROM_JOIN_PATTERN = re.compile(r'\b(?:FROM|JOIN)\s+', re.I)
+# One item of a FROM list, with its optional alias and the comma before the next item
+TABLE_ITEM_PATTERN = re.compile(rf'({QUALIFIED_NAME})(?:\s+(?:AS\s+)?\w+)?\s*(,)?\s*', re.I)
+# Names defined by WITH ... AS ( are common table expressions, not tables
+CTE_PATTERN = re.compile(r'\b(\w+)\s+AS\s*\(', re.I)
+
+def table_references(sql):
+    # Final name part of every table read in FROM and JOIN clauses, in order of first appearance
+    if not isinstance(sql, str):
+        return []
+    sql = STRING_PATTERN.sub("''", COMMENT_PATTERN.sub(' ', sql))
+    local_names = {name.lower() for name in CTE_PATTERN.findall(sql)}
+
+    references = []
+    for match in FROM_JOIN_PATTERN.finditer(sql):
+        position = match.end()
+        while True:
+            item = TABLE_ITEM_PATTERN.match(sql, position)
+            if item is None:
+                break
+            name = item.group(1).split('.')[-1].strip().strip('"')
+            if name.lower() not in local_names and name not in references:
+                references.append(name)
+            if not item.group(2):
+                break
+            position = item.end()
+    return references
+
+@profiled(rows=len)
+def build_lineage_graph(all_scripts, table_names=()):
+    """
+    Map each dataset mnemonic to the datasets its script reads from.
+
+    Each script is parsed once. References are kept only when they name a known dataset,
+    i.e. a mnemonic of the scripts export or a table of the catalog, matched case-insensitively.
+    """
+    scripts = all_scripts.drop_duplicates(subset='DATA_SET_MNEMONIC', keep='first')
+    mnemonics = scripts['DATA_SET_MNEMONIC'].dropna().tolist()
+    known = {str(name).lower(): name for name in table_names}
+    known.update((mnemonic.lower(), mnemonic) for mnemonic in mnemonics)
+
+    graph = {}
+    for mnemonic, sql in zip(scripts['DATA_SET_MNEMONIC'].tolist(), scripts['TRANSFORMATION_SQL'].tolist()):
+        if not isinstance(mnemonic, str):
+            continue
+        upstream = []
+        for reference in table_references(sql):
+            name = known.get(reference.lower())
+            if name is not None and name != mnemonic and name not in upstream:
+                upstream.append(name)
+        graph[mnemonic] = upstream
+    return graph
+
+def upstream_closure(graph, roots):
+    """
+    Return every dataset upstream of the roots.
+
+    The walk is iterative with one visited set shared by all roots, so each dataset and
+    each reference is visited once, whatever the depth of the chains or cycles between scripts.
+    """
+    upstream = set()
+    pending = [child for root in roots for child in graph.get(root, ())]
+    while pending:
+        node = pending.pop()
+        if node in upstream:
+            continue
+        upstream.add(node)
+        pending.extend(child for child in graph.get(node, ()) if child not in upstream)
+    return upstream
+
+def scope_project(catalog, all_scripts, roots, graph=None):
+    """
+    Return the tables and scripts of a project from the full exports, given its root datasets.
+
+    The result has the shapes of read_csv_schema and read_csv_scripts, covering the roots
+    and every dataset upstream of them.
+    """
+    if graph is None:
+        graph = build_lineage_graph(all_scripts, catalog['table_name'].unique())
+
+    known = {name.lower(): name for name in graph}
+    known.update((str(name).lower(), name) for name in catalog['table_name'].unique())
+    missing = [root for root in roots if root.lower() not in known]
+    if missing:
+        raise ValueError(f"Unknown root datasets: {', '.join(missing)}")
+    roots = [known[root.lower()] for root in roots]
+
+    names = set(roots) | upstream_closure(graph, roots)
+    tables = schema_from_catalog(catalog[catalog['table_name'].isin(names)])
+    scripts = all_scripts[all_scripts['DATA_SET_MNEMONIC'].isin(names)]
+    scripts = scripts.drop_duplicates(subset='DATA_SET_MNEMONIC', keep='first').reset_index(drop=True)
+    return tables, scripts
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Scope a project from the full exports by tracing the lineage of its root datasets.")
+    parser.add_argument('roots', nargs='+', help="Dataset mnemonics the project's dashboard reads")
+    parser.add_argument('--v-catalog', default='input/HEI_V_CATALOG.csv', help="Full V_CATALOG export")
+    parser.add_argument('--all-scripts', default='input/HEI_ALL_SCRIPTS.csv', help="Full scripts export")
+    parser.add_argument('--tables-out', help="Write the project's V_CATALOG rows to this CSV file")
+    parser.add_argument('--scripts-out', help="Write the project's scripts to this CSV file")
+    args = parser.parse_args(argv)
+
+    catalog = read_additional_v_catalog(args.v_catalog)
+    all_scripts = read_all_scripts(args.all_scripts)
+    try:
+        tables, scripts = scope_project(catalog, all_scripts, args.roots)
+    except ValueError as e:
+        parser.error(str(e))
+
+    print(f"{len(tables)} tables and {len(scripts)} scripts upstream of {', '.join(args.roots)}")
+    for mnemonic in scripts['DATA_SET_MNEMONIC']:
+        print(f"  {mnemonic}")
+
+    if args.tables_out:
+        catalog[catalog['table_name'].isin(set(tables))].to_csv(args.tables_out, columns=list(V_CATALOG_DTYPES), index=False)
+        print(f"Tables written to {args.tables_out}")
+    if args.scripts_out:
+        scripts.to_csv(args.scripts_out, index=False)
+        print(f"Scripts written to {args.scripts_out}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+import hashlib
+import json
+import os
+
+# Bump when the layout of the generated sheets changes, so the next run rebuilds every sheet
+EXPORT_VERSION = 3
+
+def content_digest(*parts):
+    # Stable digest of plain values; pandas and numpy scalars are hashed by their text
+    payload = json.dumps(parts, default=str, ensure_ascii=False, separators=(',', ':'))
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+def manifest_path(output_path):
+    stem, extension = os.path.splitext(output_path)
+    return f"{stem}.manifest.json"
+
+def sheet_key(kind, label, taken=()):
+    # Sheets are keyed by their dataset or mnemonic, so inserting a script does not shift the others
+    key = f"{kind}:{label}"
+    number = 2
+    while key in taken:
+        key = f"{kind}:{label}#{number}"
+        number += 1
+    return key
+
+def same_sheet(old_entry, entry, fields=('digest', 'sheet', 'file')):
+    return old_entry is not None and all(old_entry.get(field) == entry[field] for field in fields)
+
+def load_manifest(output_path):
+    path = manifest_path(output_path)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        # A damaged manifest only costs a full rebuild
+        return None
+
+def write_manifest(output_path, manifest):
+    path = manifest_path(output_path)
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=1)
+    os.replace(temp_path, path)
+
+def compare_manifests(previous, current):
+    # Added, changed and removed sheets of each kind, named by their dataset or mnemonic
+    previous_sheets = previous['sheets'] if previous else {}
+    report = {}
+    for kind in ('dataset', 'script'):
+        entries = {key: entry for key, entry in current['sheets'].items() if entry['kind'] == kind}
+        old_entries = {key: entry for key, entry in previous_sheets.items() if entry['kind'] == kind}
+        report[kind] = {
+            'added': [entry['label'] for key, entry in entries.items() if key not in old_entries],
+            'changed': [entry['label'] for key, entry in entries.items() if key in old_entries and old_entries[key]['digest'] != entry['digest']],
+            'removed': [entry['label'] for key, entry in old_entries.items() if key not in entries],
+        }
+    report['index_changed'] = previous is None or previous.get('index') != current['index']
+    return report
+
+def print_report(report, rendered=None):
+    for kind, title in (('dataset', 'Datasets'), ('script', 'Scripts')):
+        changes = report[kind]
+        print(f"{title}: {len(changes['added'])} added, {len(changes['changed'])} changed, {len(changes['removed'])} removed")
+        for change in ('added', 'changed', 'removed'):
+            if changes[change]:
+                print(f"  {change}: {', '.join(map(str, changes[change]))}")
+    if rendered is not None:
+        print(f"Workbooks rewritten: {', '.join(rendered) if rendered else 'none'}")
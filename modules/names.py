@@ -0,0 +1,76 @@
+import re
+
+# Excel limits on sheet names and table display names
+MAX_SHEET_NAME_LENGTH = 31
+MAX_TABLE_NAME_LENGTH = 255
+SHEET_NAME_FORBIDDEN = re.compile(r"[\[\]:*?/\\]")
+TABLE_NAME_FORBIDDEN = re.compile(r"[^\w.\\]")
+# Table names must not read as an A1 or R1C1 cell reference
+CELL_REFERENCE = re.compile(r"[A-Za-z]{1,3}\d+|[Rr]\d*[Cc]?\d*|[Cc]\d*", re.ASCII)
+# Sheet names that can appear unquoted in a hyperlink
+PLAIN_SHEET_NAME = re.compile(r"[A-Za-z_][A-Za-z0-9_.]*")
+
+class NameAllocator:
+    """
+    Hands out the sheet names and table display names of one workbook.
+
+    Names are checked against case-insensitive sets, as Excel compares them, and
+    each collision is resolved with a numbered suffix. The sheet allocated for a
+    key is recorded so hyperlinks always point at the name the sheet really got.
+    """
+
+    def __init__(self):
+        self._sheet_names = set()
+        self._table_names = set()
+        self._sheet_suffixes = {}
+        self._table_suffixes = {}
+        self.sheets = {}
+
+    @staticmethod
+    def _unique(name, taken, suffixes, stem_length):
+        if name.lower() not in taken:
+            taken.add(name.lower())
+            return name
+
+        # Numbering resumes where the previous collision on the same name stopped
+        suffix = suffixes.get(name.lower(), 1)
+        while True:
+            ending = f"_{suffix}"
+            candidate = f"{name[:stem_length(ending)]}{ending}"
+            suffix += 1
+            if candidate.lower() not in taken:
+                break
+        suffixes[name.lower()] = suffix
+        taken.add(candidate.lower())
+        return candidate
+
+    def sheet_name(self, requested, key=None):
+        # A key that already has a sheet keeps it, so a name can be reserved before the sheet is created
+        if key is not None and key in self.sheets:
+            return self.sheets[key]
+
+        name = SHEET_NAME_FORBIDDEN.sub('_', str(requested)).strip("'")[:MAX_SHEET_NAME_LENGTH] or 'Sheet'
+        if name.lower() == 'history':
+            name = f"{name}_"
+        name = self._unique(name, self._sheet_names, self._sheet_suffixes,
+                            lambda ending: min(27, MAX_SHEET_NAME_LENGTH - len(ending)))
+
+        if key is not None:
+            self.sheets[key] = name
+        return name
+
+    def table_name(self, requested):
+        name = TABLE_NAME_FORBIDDEN.sub('_', str(requested))
+        if not name or not (name[0].isalpha() or name[0] in '_\\') or CELL_REFERENCE.fullmatch(name):
+            name = f"_{name}"
+        return self._unique(name[:MAX_TABLE_NAME_LENGTH], self._table_names, self._table_suffixes,
+                            lambda ending: MAX_TABLE_NAME_LENGTH - len(ending))
+
+def sheet_location(sheet_name, cell='A1'):
+    # Sheet names with spaces or punctuation must be quoted, with quotes doubled
+    if PLAIN_SHEET_NAME.fullmatch(sheet_name) and not CELL_REFERENCE.fullmatch(sheet_name):
+        return f"{sheet_name}!{cell}"
+    return "'{}'!{}".format(sheet_name.replace("'", "''"), cell)
+
+def sheet_hyperlink(sheet_name, cell='A1'):
+    return f"#{sheet_location(sheet_name, cell)}"
@@ -0,0 +1,132 @@
+import json
+import os
+import time
+import tracemalloc
+from contextlib import contextmanager
+from functools import wraps
+
+# Default report written by the --profile flag of the entry points
+PROFILE_FILE = 'output/profile.json'
+BYTES_PER_MB = 1024 * 1024
+
+# The active profiler, or None when profiling is off
+_profiler = None
+
+class Profiler:
+    """
+    Records wall time, call count, rows written and peak traced memory per stage.
+
+    Stages nest: a stage's time and peak include the stages it calls, and rows are
+    counted by the innermost stage that is running when they are written.
+    """
+
+    def __init__(self, trace_memory=True):
+        self.trace_memory = trace_memory
+        self.stages = {}
+        self._stack = []
+
+    def start(self):
+        if self.trace_memory:
+            tracemalloc.start()
+        self.started = time.perf_counter()
+
+    def stop(self):
+        self.total_seconds = time.perf_counter() - self.started
+        if self.trace_memory:
+            tracemalloc.stop()
+
+    def enter(self, name):
+        if self.trace_memory:
+            # Keep the peak reached so far by the enclosing stage before restarting the peak for this one
+            if self._stack:
+                self._stack[-1][2] = max(self._stack[-1][2], tracemalloc.get_traced_memory()[1])
+            tracemalloc.reset_peak()
+        self._stack.append([name, time.perf_counter(), 0])
+
+    def exit(self, rows=0):
+        name, start, peak = self._stack.pop()
+        elapsed = time.perf_counter() - start
+        if self.trace_memory:
+            peak = max(peak, tracemalloc.get_traced_memory()[1])
+            if self._stack:
+                self._stack[-1][2] = max(self._stack[-1][2], peak)
+
+        entry = self.stages.setdefault(name, {'seconds': 0.0, 'calls': 0, 'rows': 0, 'peak_mb': 0.0})
+        entry['seconds'] += elapsed
+        entry['calls'] += 1
+        entry['rows'] += rows
+        entry['peak_mb'] = max(entry['peak_mb'], peak / BYTES_PER_MB)
+
+    def add_rows(self, rows):
+        if self._stack:
+            entry = self.stages.setdefault(self._stack[-1][0], {'seconds': 0.0, 'calls': 0, 'rows': 0, 'peak_mb': 0.0})
+            entry['rows'] += rows
+
+    def report(self):
+        return {'total_seconds': self.total_seconds, 'stages': self.stages}
+
+    def print_summary(self):
+        print(f"{'Stage':<28}{'Calls':>8}{'Rows':>10}{'Seconds':>12}{'Peak MB':>10}")
+        for name, entry in self.stages.items():
+            print(f"{name:<28}{entry['calls']:>8}{entry['rows']:>10}{entry['seconds']:>12.3f}{entry['peak_mb']:>10.1f}")
+        print(f"Total {self.total_seconds:.3f}s")
+
+def profiled(name=None, rows=None):
+    # Decorator timing each call as a stage; rows, if given, counts the rows of the result
+    def decorate(func):
+        stage_name = name or func.__name__
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if _profiler is None:
+                return func(*args, **kwargs)
+            _profiler.enter(stage_name)
+            result = None
+            try:
+                result = func(*args, **kwargs)
+                return result
+            finally:
+                _profiler.exit(rows(result) if rows is not None and result is not None else 0)
+        return wrapper
+    return decorate
+
+def add_rows(rows):
+    if _profiler is not None:
+        _profiler.add_rows(rows)
+
+def enable(trace_memory=True):
+    global _profiler
+    _profiler = Profiler(trace_memory)
+    _profiler.start()
+    return _profiler
+
+def disable():
+    global _profiler
+    profiler, _profiler = _profiler, None
+    if profiler is not None:
+        profiler.stop()
+    return profiler
+
+def write_report(report, output_file):
+    os.makedirs(os.path.dirname(output_file) or '.', exist_ok=True)
+    with open(output_file, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+
+@contextmanager
+def profile_session(output_file):
+    # Profile the enclosed run when a report file is given, otherwise do nothing
+    if not output_file:
+        yield None
+        return
+    profiler = enable()
+    try:
+        yield profiler
+    finally:
+        disable()
+        profiler.print_summary()
+        write_report(profiler.report(), output_file)
+        print(f"Profile written to {output_file}")
+
+def add_profile_argument(parser):
+    parser.add_argument('--profile', nargs='?', const=PROFILE_FILE, default=None, metavar='REPORT',
+                        help=f"Time each stage, print a summary and write a JSON report (default {PROFILE_FILE})")
@@ -1,28 +1,90 @@
 import pandas as pd
+from modules.cache import load_cached, names_digest
+from modules.profiling import profiled
 
-def read_csv_schema(file_path):
-    df = pd.read_csv(file_path)
+# Columns and dtypes of the known HEI exports
+V_CATALOG_DTYPES = {
+    'table_schema': 'category',
+    'table_name': 'category',
+    'column_name': str,
+    'data_type': 'category',
+    'ordinal_position': 'int32',
+}
+SCRIPTS_DTYPES = {
+    'WORKFLOW_NAME': str,
+    'DATA_SET_MNEMONIC': str,
+    'DATA_SET_VERSION': 'Int32',
+    'DATE_MODIFIED': str,
+    'TRANSFORMATION_SQL': str,
+}
+TABLEAU_DTYPES = {
+    'Workbook': 'category',
+    'Data Source': 'category',
+    'Field Name': str,
+    'Calculation': str,
+    'Data Type': 'category',
+}
+
+# Rows per chunk when streaming a full export through a name filter
+CHUNK_SIZE = 100_000
+
+def _read_export(file_path, dtypes, key=None, names=None):
+    if names is None:
+        return pd.read_csv(file_path, usecols=list(dtypes), dtype=dtypes)
+
+    # Stream the export and keep only rows whose key is in scope, so peak memory follows the filter
+    names = set(names)
+    chunk_dtypes = {column: (str if dtype == 'category' else dtype) for column, dtype in dtypes.items()}
+    kept = []
+    for chunk in pd.read_csv(file_path, usecols=list(dtypes), dtype=chunk_dtypes, chunksize=CHUNK_SIZE):
+        kept.append(chunk[chunk[key].isin(names)])
+    df = pd.concat(kept, ignore_index=True)
+    return df.astype({column: dtype for column, dtype in dtypes.items() if dtype == 'category'})
+
+def _load(file_path, variant, loader, use_cache, names=None):
+    if not use_cache:
+        return loader()
+    if names is not None:
+        variant = f"{variant}_{names_digest(names)}"
+    return load_cached(file_path, variant, loader)
+
+def schema_from_catalog(df):
     tables = {}
-    for _, row in df.iterrows():
-        table_schema = row['table_schema']
-        table_name = row['table_name']
-        column_name = row['column_name']
-        data_type = row['data_type']
-        ordinal_position = row['ordinal_position']
-        if table_name not in tables:
-            tables[table_name] = {'schema': table_schema, 'columns': []}
-        tables[table_name]['columns'].append((ordinal_position, column_name, data_type))
+    # Tables keep the order they first appear in the export, columns keep their file order
+    for table_name, group in df.groupby('table_name', sort=False, observed=True):
+        columns = zip(group['ordinal_position'].tolist(), group['column_name'].tolist(), group['data_type'].tolist())
+        tables[table_name] = {'schema': group['table_schema'].iat[0], 'columns': list(columns)}
     return tables
 
-def read_csv_scripts(file_path):
-    return pd.read_csv(file_path)
+def _parse_schema(file_path):
+    return schema_from_catalog(_read_export(file_path, V_CATALOG_DTYPES))
 
-def read_csv_tableau(file_path, workbook_name):
-    df = pd.read_csv(file_path)
+@profiled(rows=len)
+def read_csv_schema(file_path, use_cache=True):
+    return _load(file_path, 'schema', lambda: _parse_schema(file_path), use_cache)
+
+@profiled(rows=len)
+def read_csv_scripts(file_path, use_cache=True):
+    return _load(file_path, 'scripts', lambda: _read_export(file_path, SCRIPTS_DTYPES), use_cache)
+
+def read_all_tableau(file_path, use_cache=True):
+    return _load(file_path, 'tableau', lambda: _read_export(file_path, TABLEAU_DTYPES), use_cache)
+
+@profiled(rows=len)
+def read_csv_tableau(file_path, workbook_name, use_cache=True):
+    df = read_all_tableau(file_path, use_cache)
     return df[df['Workbook'] == workbook_name]
 
-def read_additional_v_catalog(file_path):
-    return pd.read_csv(file_path)
+@profiled(rows=len)
+def read_additional_v_catalog(file_path, table_names=None, use_cache=True):
+    loader = lambda: _read_export(file_path, V_CATALOG_DTYPES, 'table_name', table_names)
+    return _load(file_path, 'v_catalog', loader, use_cache, table_names)
+
+@profiled(rows=len)
+def read_all_scripts(file_path, dataset_mnemonics=None, use_cache=True):
+    loader = lambda: _read_export(file_path, SCRIPTS_DTYPES, 'DATA_SET_MNEMONIC', dataset_mnemonics)
+    return _load(file_path, 'all_scripts', loader, use_cache, dataset_mnemonics)
 
-def read_all_scripts(file_path):
-    return pd.read_csv(file_path)
+def in_scope_names(tables, scripts):
+    # Every table or mnemonic a project catalog can look up in the full exports
+    return set(tables) | set(scripts['DATA_SET_MNEMONIC'].dropna())
@@ -0,0 +1,294 @@
+import csv
+import hashlib
+import json
+import os
+import re
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from lxml import etree
+from modules.cache import CACHE_FOLDER
+from modules.profiling import profiled
+
+# Columns of the extracted tableau.csv and of its dependency edge list
+FIELDNAMES = ['Workbook', 'Data Source', 'Field Name', 'Calculation', 'Data Type']
+DEPENDENCY_FIELDNAMES = ['Workbook', 'Data Source', 'Field Name', 'Depends On', 'Direct']
+
+# Workbook files picked up by the extractor: plain workbooks and packaged workbooks (zip archives)
+WORKBOOK_EXTENSION = '.twb'
+PACKAGED_WORKBOOK_EXTENSION = '.twbx'
+
+# Folder holding the extracted fields of each workbook, keyed by file hash
+TABLEAU_CACHE_FOLDER = os.path.join(CACHE_FOLDER, 'tableau')
+# Bump when the extraction output changes so cached parts are re-extracted
+EXTRACT_VERSION = 2
+
+# References rewritten in a formula: calculation IDs, and sqlproxy fields qualified by their data source
+REFERENCE_PATTERN = re.compile(r'\[(Calculation_\d+)\]|\[sqlproxy\.(\w+)\]\.\[([^\]]+)\]')
+SQLPROXY_PATTERN = re.compile(r'\[sqlproxy\.(\w+)\]\.\[([^\]]+)\]')
+CALCULATION_ID_PATTERN = re.compile(r'\[Calculation_\d+\]')
+# Any bracketed field reference, with an optional bracketed qualifier
+FIELD_REFERENCE_PATTERN = re.compile(r'(?:\[([^\[\]]+)\]\.)?\[([^\[\]]+)\]')
+
+# Function to replace calculation IDs and sqlproxy references with field names
+def replace_calc_ids_with_names(calculation, field_name_map, proxy_name_map):
+    # Every reference is rewritten in a single pass over the formula
+    def replace(match):
+        calculation_id, proxy_key, proxy_field = match.groups()
+        if calculation_id:
+            return f'[{field_name_map.get(calculation_id, calculation_id)}]'
+        proxy_field = field_name_map.get(proxy_field, proxy_field)
+        return f'[{proxy_name_map.get(proxy_key, f"sqlproxy.{proxy_key}")}].[{proxy_field}]'
+
+    return REFERENCE_PATTERN.sub(replace, calculation)
+
+def build_dependency_graph(fields):
+    # Map each calculated field to the fields of the same data source its formula references
+    names_by_id = {field['id']: field['name'] for field in fields if field['id']}
+    graph = {}
+    for field in fields:
+        if not field['calculation'] or field['calculation'].isspace():
+            continue
+        references = graph.setdefault(field['name'], [])
+        for qualifier, token in FIELD_REFERENCE_PATTERN.findall(field['calculation']):
+            if qualifier and not qualifier.startswith('sqlproxy.'):
+                continue
+            name = names_by_id.get(f'[{token}]')
+            if name is not None and name != field['name'] and name not in references:
+                references.append(name)
+    return graph
+
+def resolve_dependencies(graph):
+    # Transitive dependencies of every field, each field resolved once
+    resolved = {}
+
+    def resolve(name, visiting):
+        if name in resolved:
+            return resolved[name]
+        if name in visiting:
+            return frozenset()
+        visiting.add(name)
+        dependencies = set()
+        for dependency in graph.get(name, ()):
+            dependencies.add(dependency)
+            dependencies |= resolve(dependency, visiting)
+        visiting.discard(name)
+        resolved[name] = frozenset(dependencies)
+        return resolved[name]
+
+    return {name: resolve(name, set()) for name in graph}
+
+def _column_field(column):
+    # Same attributes tableaudocumentapi reads for a <column>: the alias, caption or name becomes the field name
+    calculation = column.find('.//calculation')
+    return {
+        'id': column.get('name'),
+        'name': column.get('alias') or column.get('caption') or column.get('name'),
+        'calculation': calculation.get('formula') if calculation is not None else None,
+        'datatype': column.get('datatype'),
+    }
+
+def iter_datasource_fields(source):
+    """
+    Stream a workbook's XML and yield (data source name, fields) for each data source.
+
+    Only the <column> elements of the top-level data sources and their <calculation> children
+    are kept; every other element is discarded as soon as it has been parsed.
+    """
+    depth = 0
+    column_depth = 0
+    in_datasources = False
+    datasources_done = False
+    datasource_name = None
+    fields = None
+
+    for event, elem in etree.iterparse(source, events=('start', 'end'), huge_tree=True):
+        if event == 'start':
+            depth += 1
+            if depth == 1 and elem.tag != 'workbook':
+                raise ValueError(f"Root element is <{elem.tag}>, expected <workbook>")
+            elif depth == 2 and elem.tag == 'datasources' and not datasources_done:
+                in_datasources = True
+            elif depth == 3 and in_datasources:
+                datasource_name = elem.get('caption') or elem.get('name') or elem.get('formatted-name')
+                fields = {}
+            elif in_datasources and depth > 3 and elem.tag == 'column':
+                column_depth += 1
+            continue
+
+        depth -= 1
+        if in_datasources and depth > 2 and elem.tag == 'column':
+            # Fields are keyed by column name: the first occurrence keeps its position, the last one wins
+            field = _column_field(elem)
+            fields[field['id']] = field
+            column_depth -= 1
+        elif in_datasources and depth == 2:
+            yield datasource_name, list(fields.values())
+        elif in_datasources and depth == 1:
+            in_datasources = False
+            datasources_done = True
+
+        # Children of a column are kept until the column itself has been read, everything else is dropped
+        if column_depth == 0:
+            elem.clear()
+            while elem.getprevious() is not None:
+                del elem.getparent()[0]
+
+@profiled(rows=lambda result: len(result[0]))
+def extract_workbook(source, workbook_name):
+    calculated_fields = []
+    dependencies = []
+
+    for datasource_name, fields in iter_datasource_fields(source):
+        if datasource_name.lower() == 'parameters':
+            continue
+
+        calculated = [field for field in fields if field['calculation'] and not field['calculation'].isspace()]
+
+        # Map calculation IDs to the name of the field they identify, and sqlproxy keys to the data source
+        field_name_map = {}
+        proxy_name_map = {}
+        for field in fields:
+            if field['id'] and CALCULATION_ID_PATTERN.fullmatch(field['id']):
+                field_name_map[field['id'][1:-1]] = field['name']
+        for field in calculated:
+            for proxy_key, proxy_field in SQLPROXY_PATTERN.findall(field['calculation']):
+                proxy_name_map[proxy_key] = datasource_name
+
+        for field in calculated:
+            # Replace calculation IDs and sqlproxy references with field names in the calculation string
+            calculation_with_names = replace_calc_ids_with_names(
+                field['calculation'].strip(), field_name_map, proxy_name_map)
+            calculated_fields.append({
+                'Workbook': workbook_name,
+                'Data Source': datasource_name,
+                'Field Name': field['name'],
+                'Calculation': calculation_with_names.replace('\n', ' '),
+                'Data Type': field['datatype']
+            })
+
+        graph = build_dependency_graph(fields)
+        for field_name, resolved in resolve_dependencies(graph).items():
+            for dependency in sorted(resolved):
+                dependencies.append({
+                    'Workbook': workbook_name,
+                    'Data Source': datasource_name,
+                    'Field Name': field_name,
+                    'Depends On': dependency,
+                    'Direct': 'Yes' if dependency in graph[field_name] else 'No'
+                })
+
+    return calculated_fields, dependencies
+
+def is_packaged(filepath):
+    return filepath.lower().endswith(PACKAGED_WORKBOOK_EXTENSION)
+
+def packaged_workbook_member(archive):
+    # A package holds its workbook at the top level, next to folders of extracts and images
+    members = [info for info in archive.infolist() if info.filename.lower().endswith(WORKBOOK_EXTENSION) and not info.is_dir()]
+    members.sort(key=lambda info: info.filename.count('/'))
+    if not members:
+        raise ValueError(f"{archive.filename} holds no {WORKBOOK_EXTENSION} workbook")
+    return members[0]
+
+def _extract_file(filepath):
+    if not is_packaged(filepath):
+        return extract_workbook(filepath, os.path.basename(filepath))
+
+    # Only the workbook XML is decompressed, as a stream; the bundled extracts are never read
+    with zipfile.ZipFile(filepath) as archive, archive.open(packaged_workbook_member(archive)) as source:
+        return extract_workbook(source, os.path.basename(filepath))
+
+def list_workbooks(input_folder):
+    extensions = (WORKBOOK_EXTENSION, PACKAGED_WORKBOOK_EXTENSION)
+    return sorted(os.path.join(input_folder, filename) for filename in os.listdir(input_folder) if filename.lower().endswith(extensions))
+
+def _extract_files(filepaths, workers):
+    if workers == 1 or len(filepaths) <= 1:
+        return {filepath: _extract_file(filepath) for filepath in filepaths}
+
+    # Workbooks are independent, so each one is parsed in its own process
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return dict(zip(filepaths, pool.map(_extract_file, filepaths)))
+
+def file_digest(filepath):
+    if is_packaged(filepath):
+        # A package is identified by its workbook member, so refreshing the bundled data does not
+        # force a re-extract and the extracts are not read to hash them
+        with zipfile.ZipFile(filepath) as archive:
+            member = packaged_workbook_member(archive)
+        return hashlib.sha1(f"{member.filename}:{member.CRC}:{member.file_size}".encode('utf-8')).hexdigest()
+
+    digest = hashlib.sha1()
+    with open(filepath, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def _extract_incremental(filepaths, workers, cache_folder):
+    os.makedirs(cache_folder, exist_ok=True)
+    part_names = {filepath: f"{file_digest(filepath)}_v{EXTRACT_VERSION}.json" for filepath in filepaths}
+
+    extracted = {}
+    pending = []
+    for filepath in filepaths:
+        part_path = os.path.join(cache_folder, part_names[filepath])
+        if not os.path.exists(part_path):
+            pending.append(filepath)
+            continue
+        with open(part_path, encoding='utf-8') as f:
+            part = json.load(f)
+        # A renamed but unchanged workbook reuses its part under the new name
+        for row in part['fields'] + part['dependencies']:
+            row['Workbook'] = os.path.basename(filepath)
+        extracted[filepath] = (part['fields'], part['dependencies'])
+
+    for filepath, (workbook_fields, workbook_dependencies) in _extract_files(pending, workers).items():
+        part_path = os.path.join(cache_folder, part_names[filepath])
+        temp_path = f"{part_path}.{os.getpid()}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump({'fields': workbook_fields, 'dependencies': workbook_dependencies}, f)
+        os.replace(temp_path, part_path)
+        extracted[filepath] = (workbook_fields, workbook_dependencies)
+
+    # Drop the parts of deleted or modified workbooks
+    current_parts = set(part_names.values())
+    dropped = 0
+    for part_name in os.listdir(cache_folder):
+        if part_name.endswith('.json') and part_name not in current_parts:
+            os.remove(os.path.join(cache_folder, part_name))
+            dropped += 1
+
+    print(f"Tableau workbooks: {len(filepaths) - len(pending)} unchanged, {len(pending)} extracted, {dropped} cached parts dropped")
+    return extracted
+
+@profiled(rows=lambda result: len(result[0]))
+def extract_folder(input_folder, workers=None, cache_folder=None):
+    filepaths = list_workbooks(input_folder)
+
+    if cache_folder is None:
+        extracted = _extract_files(filepaths, workers)
+    else:
+        extracted = _extract_incremental(filepaths, workers, cache_folder)
+
+    calculated_fields = []
+    dependencies = []
+    for filepath in filepaths:
+        workbook_fields, workbook_dependencies = extracted[filepath]
+        calculated_fields.extend(workbook_fields)
+        dependencies.extend(workbook_dependencies)
+
+    # Sort the calculated fields first by workbook, then by data source, then by field name
+    calculated_fields.sort(key=lambda x: (x['Workbook'], x['Data Source'], x['Field Name']))
+    dependencies.sort(key=lambda x: (x['Workbook'], x['Data Source'], x['Field Name'], x['Depends On']))
+    return calculated_fields, dependencies
+
+@profiled()
+def write_tableau_csv(calculated_fields, output_file, fieldnames=FIELDNAMES):
+    with open(output_file, 'w', newline='', encoding='utf-8') as csvfile:
+        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
+        writer.writeheader()
+        for field in calculated_fields:
+            writer.writerow(field)
+
+def write_dependencies_csv(dependencies, output_file):
+    write_tableau_csv(dependencies, output_file, DEPENDENCY_FIELDNAMES)
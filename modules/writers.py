@@ -0,0 +1,173 @@
+import warnings
+from collections import namedtuple
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.utils import get_column_letter
+from openpyxl.worksheet.filters import AutoFilter
+from openpyxl.worksheet.hyperlink import Hyperlink
+from openpyxl.worksheet._write_only import WriteOnlyWorksheet
+from openpyxl.worksheet.table import Table, TableColumn, TableStyleInfo
+from openpyxl.worksheet.worksheet import Worksheet
+from modules.names import NameAllocator
+from modules.profiling import profiled, add_rows
+
+# Writer engines: the regular in-memory openpyxl workbook, or write-only sheets streamed to disk
+WRITER_ENGINES = ('openpyxl', 'stream')
+
+# A cell value with its formatting, applied by whichever engine writes the row
+CellSpec = namedtuple('CellSpec', ['value', 'style', 'hyperlink', 'font', 'alignment', 'as_text'])
+
+def styled(value, style=None, hyperlink=None, font=None, alignment=None, as_text=False):
+    return CellSpec(value, style, hyperlink, font, alignment, as_text)
+
+def _apply_spec(cell, spec):
+    if spec.as_text:
+        cell.data_type = 's'
+    if isinstance(spec.hyperlink, tuple):
+        # A link into another workbook, given as the file and the location to open in it
+        target, location = spec.hyperlink
+        cell.hyperlink = Hyperlink(ref='', target=target, location=location)
+    elif spec.hyperlink:
+        cell.hyperlink = spec.hyperlink
+    if spec.style:
+        cell.style = spec.style
+    if spec.font:
+        cell.font = spec.font
+    if spec.alignment:
+        cell.alignment = spec.alignment
+
+class SheetWriter:
+    """
+    Writes a worksheet row by row, top to bottom.
+
+    The writer keeps its own row cursor and the ranges of the tables being written,
+    so builders never query the sheet. Column widths and gridlines must be set before
+    the first row, and tables added before the sheet is closed, so the same builder
+    works with either engine.
+    """
+
+    def __init__(self, ws, names):
+        self.ws = ws
+        self.names = names
+        self.title = ws.title
+        self.row = 0
+        self._open_tables = {}
+
+    def set_column_widths(self, widths):
+        for column_letter, width in widths.items():
+            self.ws.column_dimensions[column_letter].width = width
+
+    def hide_gridlines(self):
+        self.ws.sheet_view.showGridLines = False
+
+    def append(self, values=()):
+        self.row += 1
+        self._append(list(values))
+
+    def append_rows(self, rows):
+        # Rows can come straight from DataFrame.itertuples, zip or any other iterable of sequences
+        for values in rows:
+            self.row += 1
+            self._append(list(values))
+
+    def start_table(self, display_name, headers, style_name, first_column=1):
+        # The table's header row is the next row written. The name may be changed to keep it valid
+        # and unique in the workbook, so the allocated name is returned for end_table.
+        display_name = self.names.table_name(display_name)
+        self._open_tables[display_name] = (self.row + 1, first_column, headers, style_name)
+        return display_name
+
+    def end_table(self, display_name, end_row=None):
+        # The table ends at the current row unless the rows below it belong to other content
+        start_row, first_column, headers, style_name = self._open_tables.pop(display_name)
+        end_row = self.row if end_row is None else end_row
+        ref = f"{get_column_letter(first_column)}{start_row}:{get_column_letter(first_column + len(headers) - 1)}{end_row}"
+        self.add_table(display_name, ref, style_name, headers)
+
+    def add_table(self, display_name, ref, style_name, headers):
+        table = Table(displayName=display_name, ref=ref)
+        table.tableStyleInfo = TableStyleInfo(name=style_name, showFirstColumn=False, showLastColumn=False, showRowStripes=True, showColumnStripes=False)
+        self._add_table(table, headers)
+
+    def _add_table(self, table, headers):
+        # The allocator already made the name unique, so openpyxl's scan of every table in the workbook is skipped
+        self.ws._tables.add(table)
+
+    def close(self):
+        add_rows(self.row)
+
+class OpenpyxlSheetWriter(SheetWriter):
+    def _append(self, values):
+        self.ws.append({column: (value.value if isinstance(value, CellSpec) else value) for column, value in enumerate(values, start=1) if value is not None})
+        for column, value in enumerate(values, start=1):
+            if isinstance(value, CellSpec):
+                _apply_spec(self.ws.cell(row=self.row, column=column), value)
+
+    def merge_cells(self, start_row, start_column, end_row, end_column):
+        self.ws.merge_cells(start_row=start_row, start_column=start_column, end_row=end_row, end_column=end_column)
+
+class StreamingSheetWriter(SheetWriter):
+    def _append(self, values):
+        row = []
+        for value in values:
+            if isinstance(value, CellSpec):
+                cell = WriteOnlyCell(self.ws, value=value.value)
+                _apply_spec(cell, value)
+                value = cell
+            row.append(value)
+        self.ws.append(row)
+
+    def _add_table(self, table, headers):
+        # Write-only sheets cannot read their header row back, so the table columns are declared here
+        table.tableColumns = [TableColumn(id=column_id, name=str(header)) for column_id, header in enumerate(headers, start=1)]
+        table.autoFilter = AutoFilter(ref=table.ref)
+        with warnings.catch_warnings():
+            warnings.filterwarnings('ignore', message="In write-only mode you must add table columns manually")
+            super()._add_table(table, headers)
+
+    def merge_cells(self, start_row, start_column, end_row, end_column):
+        raise ValueError("Merged cells are not supported by the streaming writer")
+
+    def close(self):
+        # Flush the finished sheet to its temporary file so only one sheet is open at a time
+        super().close()
+        self.ws.close()
+
+class WorkbookWriter:
+    def __init__(self, engine='openpyxl'):
+        if engine not in WRITER_ENGINES:
+            raise ValueError(f"Unknown writer engine '{engine}', expected one of {', '.join(WRITER_ENGINES)}")
+        self.engine = engine
+        self.names = NameAllocator()
+        self.wb = Workbook(write_only=(engine == 'stream'))
+        if engine == 'openpyxl':
+            self.wb.remove(self.wb.active)
+            self.sheet_class = OpenpyxlSheetWriter
+        else:
+            self.sheet_class = StreamingSheetWriter
+
+    @property
+    def sheetnames(self):
+        return self.wb.sheetnames
+
+    def add_named_style(self, style):
+        if style.name not in self.wb.named_styles:
+            self.wb.add_named_style(style)
+
+    def create_sheet(self, title, index=None, key=None):
+        # The sheet gets the name allocated for its key, which may differ from the requested title
+        title = self.names.sheet_name(title, key)
+        return self.sheet_class(self._new_worksheet(title, index), self.names)
+
+    def _new_worksheet(self, title, index):
+        # Allocated names are already valid and unique, so the title setter's scan of every
+        # sheet name is skipped: the sheet is built detached, then titled and attached directly
+        ws = (WriteOnlyWorksheet if self.wb.write_only else Worksheet)(None, title)
+        ws._parent = self.wb
+        ws._WorkbookChild__title = title
+        self.wb._add_sheet(ws, index)
+        return ws
+
+    @profiled('save')
+    def save(self, output_path):
+        self.wb.save(output_path)
@@ -0,0 +1,77 @@
+"""
+This script builds a searchable SQLite catalog of the full HEI exports and
+searches it. The database holds every V_CATALOG column, every script from
+HEI_ALL_SCRIPTS.csv and every Tableau calculated field, with full-text indexes
+over the SQL and the calculations.
+
+To build output/HEI_CATALOG.db from the full exports:
+    python search_catalog.py build
+
+To find the scripts that reference a table or column, Tableau calculations
+using a field, or columns by name (* is a wildcard):
+    python search_catalog.py query ph_f_person
+    python search_catalog.py query "Patient Count" --in tableau
+    python search_catalog.py query "*nhs_number*" --in columns
+
+Full-text query syntax (AND, OR, NEAR, prefix*) is available with --raw:
+    python search_catalog.py query "valproate AND prescription" --raw
+"""
+
+import argparse
+import os
+import sqlite3
+import sys
+from modules.catalog_db import SEARCH_TARGETS, export_to_sqlite, search
+
+# Constants for file paths
+CSV_FILE_V_CATALOG = 'input/HEI_V_CATALOG.csv'     # CSV file containing V_CATALOG data
+CSV_FILE_ALL_SCRIPTS = 'input/HEI_ALL_SCRIPTS.csv' # CSV file containing all scripts
+CSV_FILE_TABLEAU = 'output/tableau.csv'            # CSV file containing the Tableau calculated fields
+DATABASE_FILE = 'output/HEI_CATALOG.db'            # SQLite catalog to build and search
+
+def build(args):
+    # pandas is only needed to build the catalog, so searches start without importing it
+    from modules.readers import read_additional_v_catalog, read_all_scripts, read_all_tableau
+
+    os.makedirs(os.path.dirname(args.db) or '.', exist_ok=True)
+    catalog = read_additional_v_catalog(args.v_catalog)
+    scripts = read_all_scripts(args.all_scripts)
+    tableau_fields = read_all_tableau(args.tableau)
+    export_to_sqlite(catalog, scripts, tableau_fields, args.db)
+    print(f"{len(catalog)} columns, {len(scripts)} scripts and {len(tableau_fields)} Tableau fields written to {args.db}")
+
+def query(args):
+    rows = search(args.db, args.text, args.target, args.limit, args.raw)
+    for row in rows:
+        # Snippets span several SQL lines, each match is printed on one
+        print(' | '.join('' if value is None else ' '.join(str(value).split()) for value in row))
+    print(f"{len(rows)} match{'es' if len(rows) != 1 else ''}" + (f" (limit {args.limit})" if len(rows) == args.limit else ''))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build and search a SQLite catalog of datasets, scripts and Tableau fields.")
+    parser.add_argument('--db', default=DATABASE_FILE, help=f"SQLite catalog file (default {DATABASE_FILE})")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    build_parser = subparsers.add_parser('build', help="Build the catalog from the full exports")
+    build_parser.add_argument('--v-catalog', default=CSV_FILE_V_CATALOG, help="Full V_CATALOG export")
+    build_parser.add_argument('--all-scripts', default=CSV_FILE_ALL_SCRIPTS, help="Full scripts export")
+    build_parser.add_argument('--tableau', default=CSV_FILE_TABLEAU, help="Extracted Tableau calculated fields")
+    build_parser.set_defaults(handler=build)
+
+    query_parser = subparsers.add_parser('query', help="Search scripts, Tableau calculations or column names")
+    query_parser.add_argument('text', help="Text to search for")
+    query_parser.add_argument('--in', dest='target', choices=SEARCH_TARGETS, default='scripts', help="What to search (default scripts)")
+    query_parser.add_argument('--limit', type=int, default=50, help="Maximum number of matches")
+    query_parser.add_argument('--raw', action='store_true', help="Pass the text as a full-text query instead of a phrase")
+    query_parser.set_defaults(handler=query)
+
+    args = parser.parse_args(argv)
+    try:
+        args.handler(args)
+    except FileNotFoundError as e:
+        sys.exit(str(e))
+    except sqlite3.OperationalError as e:
+        sys.exit(f"Search failed: {e}")
+
+if __name__ == "__main__":
+    main()